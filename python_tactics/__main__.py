@@ -1,3 +1,60 @@
+# Imported first, so the startup timeline counts from as early as it can
+from python_tactics import startup # pylint: disable=wrong-import-order
+
+import argparse
+import importlib
+import os
+import sys
+
+# Modules that add subcommands, in the order --help lists them, and the commands each adds
+COMMANDS = {
+    "simulate" : ("simulate",),
+    "replay"   : ("replay",),
+    "network"  : ("relay", "join"),
+    "packer"   : ("atlas",),
+}
+# Options before the command that are followed by a value
+TAKES_VALUE = {"--map"}
+
+
+def command_modules(argv):
+    """ The modules to add subcommands from. They pull in the battle engine and
+        numpy, so launching the game imports none of them and a command only
+        imports its own. Help, or a command that is not known, needs them all.
+    """
+    values = {index + 1 for index, arg in enumerate(argv) if arg in TAKES_VALUE}
+    named = next((arg for index, arg in enumerate(argv) if not arg.startswith("-") and index not in values), None)
+    if named is None:
+        return list(COMMANDS) if {"-h", "--help"} & set(argv) else []
+    found = [module for module, commands in COMMANDS.items() if named in commands]
+    return found or list(COMMANDS)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog="python_tactics")
+    commands = parser.add_subparsers(dest="command")
+    for name in command_modules(argv):
+        with startup.span("import python_tactics.%s" % name):
+            module = importlib.import_module("python_tactics.%s" % name)
+        module.add_parser(commands)
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long each step of starting took, once the main menu is up")
+    parser.add_argument("--map", metavar="PATH", help="play new games on the terrain in this map file")
+    args = parser.parse_args(argv)
+    if args.map and not os.path.isfile(args.map):
+        parser.error("no map file at %s" % args.map)
+    startup.mark("parsed arguments")
+    if args.startup_report:
+        startup.enable_report()
+    if args.command is None:
+        #pylint: disable=import-outside-toplevel
+        with startup.span("import pyglet and the main menu"):
+            from python_tactics.start import start
+        start(map_path=args.map)
+    else:
+        args.run(args)
+
+
 if __name__=="__main__":
-    from python_tactics.start import start
-    start()
+    main()
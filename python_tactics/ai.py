@@ -0,0 +1,425 @@
+"""
+    Computer players. A policy is called with a Battle and a random.Random
+    and returns one of the battle's legal actions for the team whose turn
+    it is. Nothing in here depends on pyglet.
+
+    ComputerPlayer instead searches ahead with alpha-beta in a worker
+    process, under a time budget for each turn. The worker gives up on a
+    search once its deadline passes or the player moves on, so it is free
+    for the next one.
+"""
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from python_tactics.battle import ATTACK, MOVE
+from python_tactics.forecast import expected_damage as mean_damage
+from python_tactics.forecast import forecast_many
+
+
+def random_policy(battle, rng):
+    " Picks any legal action "
+    return rng.choice(battle.legal_actions())
+
+
+def aggressive_policy(battle, rng):
+    """ Attacks the weakest enemy in reach if it can, otherwise moves whichever
+        unit gets closest to an enemy. Knows where every enemy is, fog or not.
+    """
+    actions = battle.legal_actions()
+    attacks = [action for action in actions if action.kind == ATTACK]
+    if attacks:
+        health = battle.units["health"]
+        weakest = min(int(health[battle.occupancy.at(action.i, action.j)]) for action in attacks)
+        return rng.choice([action for action in attacks
+                           if health[battle.occupancy.at(action.i, action.j)] == weakest])
+    moves = [action for action in actions if action.kind == MOVE]
+    if not moves:
+        return actions[0]
+    enemies = [battle.position(enemy) for enemy in battle.occupancy.enemies(battle.turn)]
+
+    def distance(action):
+        return min(abs(action.i - i) + abs(action.j - j) for i, j in enemies)
+    closest = min(distance(action) for action in moves)
+    return rng.choice([action for action in moves if distance(action) == closest])
+
+
+def search_policy(battle, _rng, budget=0.05):
+    " Searches ahead for budget seconds in this process "
+    return think(battle, budget)
+
+
+POLICIES = {
+    "random"     : random_policy,
+    "aggressive" : aggressive_policy,
+    "search"     : search_policy,
+}
+
+
+# Searching ahead
+
+WIN = 1e6
+GRACE = 0.25
+
+EXACT, LOWER, UPPER = list(range(3))
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def expected_damage(_rng, strength, defense):
+    " Stands in for battle.damage while searching, so attacks have one outcome "
+    return max(1, round(mean_damage(strength, defense)))
+
+
+def threat(battle, team, positions):
+    """ Sum over team's units of the most of an enemy's health, as a fraction,
+        that each could expect to take off with an attack from where it
+        stands, plus its best chance of a kill
+    """
+    attackers, defenders = [], []
+    for unit in battle.occupancy.members(team):
+        i, j = positions[unit]
+        reach = battle.stats(unit).range
+        for enemy in battle.occupancy.enemies(team):
+            e_i, e_j = positions[enemy]
+            if abs(i - e_i) + abs(j - e_j) <= reach:
+                attackers.append(unit)
+                defenders.append(enemy)
+    if not attackers:
+        return 0.0
+    stats = [battle.stats(unit) for unit in attackers], [battle.stats(enemy) for enemy in defenders]
+    healths = battle.units["health"][defenders]
+    _, _, expected, kill = forecast_many([s.strength for s in stats[0]], [s.defense for s in stats[1]], healths)
+    value = expected / [s.health for s in stats[1]] + kill
+    best = {}
+    for unit, worth in zip(attackers, value):
+        best[unit] = max(best.get(unit, 0.0), worth)
+    return sum(best.values())
+
+
+def evaluate(battle, team):
+    " How good battle looks for team, ignoring whose turn it is "
+    if battle.winner is not None:
+        return WIN if battle.winner == team else -WIN
+    score = 0.0
+    positions = {}
+    for unit in range(len(battle.units)):
+        if not battle.alive(unit):
+            continue
+        record = battle.units[unit]
+        worth = 50 + 50 * int(record["health"]) / battle.stats(unit).health
+        score += worth if record["team"] == team else -worth
+        positions[unit] = battle.position(unit)
+    # Attacks lined up for either side, from the exact forecasts
+    score += 10 * threat(battle, team, positions)
+    for other in range(battle.team_count):
+        if other != team:
+            score -= 10 * threat(battle, other, positions)
+    # A little credit for closing in, so quiet positions still make progress
+    for unit in battle.occupancy.members(team):
+        i, j = positions[unit]
+        enemies = [positions[enemy] for enemy in battle.occupancy.enemies(team)]
+        if enemies:
+            score -= 0.5 * min(abs(i - e_i) + abs(j - e_j) for e_i, e_j in enemies)
+    return score
+
+
+class Zobrist:
+    """ Random 64 bit keys for each (unit, tile), (unit, health), (unit, tick
+        it is next ready on), active unit and searching team, handed out as
+        they are first needed
+    """
+
+    def __init__(self, seed=0):
+        self._rng = random.Random(seed)
+        self._keys = {}
+
+    def key(self, *feature):
+        found = self._keys.get(feature)
+        if found is None:
+            found = self._keys[feature] = self._rng.getrandbits(64)
+        return found
+
+    def hash(self, battle):
+        value = self.key("active", battle.active)
+        ready = battle.initiative.ready
+        for unit in range(len(battle.units)):
+            if battle.alive(unit):
+                value ^= self.key("tile", unit, battle.position(unit))
+                value ^= self.key("health", unit, int(battle.units[unit]["health"]))
+                value ^= self.key("ready", unit, ready[unit])
+        return value
+
+    def child(self, value, before, action, after):
+        " The hash of after, given it is before with action applied and before hashes to value "
+        if action.kind == MOVE:
+            value ^= self.key("tile", action.unit, before.position(action.unit))
+            value ^= self.key("tile", action.unit, (action.i, action.j))
+        elif action.kind == ATTACK:
+            target = before.occupancy.at(action.i, action.j)
+            value ^= self.key("health", target, int(before.units[target]["health"]))
+            if after.alive(target):
+                value ^= self.key("health", target, int(after.units[target]["health"]))
+            else:
+                value ^= self.key("tile", target, (action.i, action.j))
+                value ^= self.key("ready", target, before.initiative.ready[target])
+        value ^= self.key("ready", action.unit, before.initiative.ready[action.unit])
+        value ^= self.key("ready", action.unit, after.initiative.ready[action.unit])
+        if after.winner is not None:
+            return value ^ self.key("active", before.active) ^ self.key("won", after.winner)
+        return value ^ self.key("active", before.active) ^ self.key("active", after.active)
+
+
+class TranspositionTable:
+    """ A fixed number of slots indexed by hash, holding (hash, depth, score,
+        bound, best action, generation). A slot is only overwritten by the
+        same position, one searched at least as deep, or anything once the
+        slot is left over from an earlier search.
+    """
+
+    def __init__(self, size=1 << 16):
+        self.slots = [None] * size
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def get(self, value):
+        entry = self.slots[value % len(self.slots)]
+        if entry is not None and entry[0] == value:
+            return entry
+        return None
+
+    def put(self, value, depth, score, bound, action):
+        index = value % len(self.slots)
+        entry = self.slots[index]
+        if entry is None or entry[0] == value or depth >= entry[1] or entry[5] != self.generation:
+            self.slots[index] = (value, depth, score, bound, action, self.generation)
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+
+
+class Search:
+    """ Iterative deepening alpha-beta over battle copies, one action per ply.
+        Other teams are assumed to all play against the searching team, and
+        every attack deals its mean damage. Only the move_width most
+        promising moves of each unit are searched.
+    """
+
+    def __init__(self, table_size=1 << 16, move_width=6, max_depth=32):
+        self.zobrist = Zobrist()
+        self.table = TranspositionTable(table_size)
+        self.move_width = move_width
+        self.max_depth = max_depth
+        self.nodes = 0
+        self._deadline = 0
+        self._cancelled = None
+        self._team = 0
+
+    def choose(self, battle, budget, cancelled=lambda: False):
+        """ The best action found within budget seconds, and the depth searched to.
+            Stops early, with the best found so far, once cancelled returns true.
+        """
+        root = battle.copy()
+        root.damage = expected_damage
+        actions = root.legal_actions()
+        if len(actions) == 1:
+            return actions[0], 0
+        self._deadline = time.monotonic() + budget
+        self._cancelled = cancelled
+        self._team = root.turn
+        self.nodes = 0
+        self.table.new_search()
+        # Scores are from the searching team's side, so its searches must never share entries with another's
+        root_hash = self.zobrist.hash(root) ^ self.zobrist.key("searching", self._team)
+        best, depth = self._ordered(root, actions, None)[0], 0
+        try:
+            for depth in range(1, self.max_depth + 1):
+                self._alphabeta(root, root_hash, depth, -2 * WIN, 2 * WIN)
+                best = self.table.get(root_hash)[4]
+        except SearchTimeout:
+            depth -= 1
+        return best, depth
+
+    def _alphabeta(self, battle, value, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 63 == 0 and (time.monotonic() > self._deadline or self._cancelled()):
+            raise SearchTimeout()
+        if depth == 0 or battle.winner is not None:
+            return evaluate(battle, self._team)
+        original_alpha, original_beta = alpha, beta
+        known = self.table.get(value)
+        if known is not None and known[1] >= depth:
+            _, _, score, bound, _, _ = known
+            if bound == EXACT:
+                return score
+            if bound == LOWER:
+                alpha = max(alpha, score)
+            elif bound == UPPER:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+        maximising = battle.turn == self._team
+        best_score, best_action = None, None
+        for action in self._ordered(battle, battle.legal_actions(), known[4] if known else None):
+            child = battle.copy()
+            child.apply(action)
+            score = self._alphabeta(child, self.zobrist.child(value, battle, action, child), depth - 1, alpha, beta)
+            # Sooner wins, and later losses, are better
+            score -= 1 if score > WIN / 2 else -1 if score < -WIN / 2 else 0
+            if best_score is None or (score > best_score if maximising else score < best_score):
+                best_score, best_action = score, action
+            if maximising:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= original_beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.put(value, depth, best_score, bound, best_action)
+        return best_score
+
+    def _ordered(self, battle, actions, first):
+        " Attacks, then each unit's moves that close in on the enemy most, led by first if it is known "
+        attacks = [action for action in actions if action.kind != MOVE]
+        enemies = [battle.position(enemy) for enemy in battle.occupancy.enemies(battle.turn)]
+        moves = {}
+        for action in actions:
+            if action.kind == MOVE:
+                moves.setdefault(action.unit, []).append(action)
+        ordered = list(attacks)
+        for unit_moves in moves.values():
+            unit_moves.sort(key=lambda action: min(abs(action.i - i) + abs(action.j - j) for i, j in enemies))
+            ordered.extend(unit_moves[:self.move_width])
+        if first is not None and first in ordered:
+            ordered.remove(first)
+            ordered.insert(0, first)
+        return ordered
+
+
+# Each worker process keeps its search, and so its transposition table, between turns
+_search = None
+# Shared by every ComputerPlayer in this process, and only started once one is wanted
+_workers = None
+# Number of the search the worker should be running; any other gives up. Shared with the worker
+_current = None
+
+
+def think(battle, budget, cancelled=lambda: False):
+    " Runs a Search on battle, keeping it for next time "
+    global _search # pylint: disable=global-statement
+    if _search is None:
+        _search = Search()
+    return _search.choose(battle, budget, cancelled)[0]
+
+
+def _think_in_worker(battle, deadline, number):
+    " Searches until deadline, a time.time(), or until search number is no longer the current one "
+    return think(battle, deadline - time.time(), lambda: _current.value != number)
+
+
+def _start_worker(current):
+    global _current # pylint: disable=global-statement
+    _current = current
+    # Searching should never take time away from drawing frames
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+
+def _pool():
+    global _workers, _current # pylint: disable=global-statement
+    if _workers is None:
+        # Spawned rather than forked, so the worker never inherits the window or GL state
+        context = multiprocessing.get_context("spawn")
+        _current = context.Value("Q", 0, lock=False)
+        _workers = ProcessPoolExecutor(1, mp_context=context, initializer=_start_worker, initargs=(_current,))
+    return _workers
+
+
+def _drop_pool():
+    " Forgets a pool whose worker has died, so the next search starts another "
+    global _workers, _current # pylint: disable=global-statement
+    if _workers is not None:
+        _workers.shutdown(wait=False)
+    _workers, _current = None, None
+
+
+def _next_search():
+    " Moves on to a new search number, which stops whatever search is running "
+    _current.value += 1
+    return _current.value
+
+
+class ComputerPlayer:
+    """ Plays for one or more teams by searching in a worker process, so the
+        game never waits on it. Call start when it is the computer's turn, then
+        poll every frame until it hands back an action. If the worker has not
+        answered shortly after budget seconds, the aggressive policy decides.
+    """
+
+    def __init__(self, budget=1.0):
+        self.budget = budget
+        self._future = None
+        self._deadline = 0
+        self._rng = random.Random()
+        # Get the worker started now, rather than eating into the first turn
+        try:
+            _pool().submit(int)
+        except BrokenProcessPool:
+            _drop_pool()
+
+    def start(self, battle):
+        self._deadline = time.monotonic() + self.budget + GRACE
+        try:
+            pool = _pool()
+            # Deadlines are by the wall clock, since that is the same in the worker
+            self._future = pool.submit(_think_in_worker, battle.copy(), time.time() + self.budget, _next_search())
+        except BrokenProcessPool:
+            _drop_pool()
+            # An answer of None, so poll has the aggressive policy decide this turn
+            self._future = Future()
+            self._future.set_result(None)
+
+    def poll(self, battle):
+        " The chosen action once there is one, otherwise None "
+        if self._future is None:
+            return None
+        action = None
+        if self._future.done():
+            try:
+                action = self._future.result()
+            except BrokenProcessPool:
+                _drop_pool()
+            except Exception: # pylint: disable=broad-except
+                action = None
+        elif time.monotonic() < self._deadline:
+            return None
+        else:
+            self._abandon()
+        self._future = None
+        if action is None or not battle.is_legal(action):
+            action = aggressive_policy(battle, self._rng)
+        return action
+
+    def stop(self):
+        " Abandons the current search, such as when the game ends "
+        if self._future is not None:
+            self._abandon()
+            self._future = None
+
+    def _abandon(self):
+        # Cancelling only helps before the worker picks the search up; after that it has to be told
+        self._future.cancel()
+        if _current is not None:
+            _next_search()
@@ -0,0 +1,118 @@
+"""
+    A cache of images, already decoded, for starting quickly.
+
+    Decoding PNGs in Python is slow, and was most of the time it took to get
+    to the first frame. A pack holds the RGBA pixels of each image exactly as
+    OpenGL takes them. It has a fixed header, then an index with one ENTRY
+    and a UTF-8 name per image, then the pixels. Every image starts on a page
+    boundary and its bottom row comes first.
+
+    Packs are read through mmap. A texture is uploaded straight from the
+    mapped pages, with no copy in between. The index records the size and
+    modification time of each source PNG. Opening a pack with sources that
+    have changed since then writes it again.
+"""
+import ctypes
+import mmap
+import os
+import struct
+
+from pyglet.image import ImageData
+
+from python_tactics.packer import read_png
+
+MAGIC = b"PTAP"
+VERSION = 1
+ALIGNMENT = 4096
+
+# magic, version, image count
+HEADER = struct.Struct("<4sHI")
+# source size, source modification time in nanoseconds, width, height, offset of the pixels, length of the name
+ENTRY = struct.Struct("<QqIIQH")
+
+
+def _stamp(path):
+    status = os.stat(path)
+    return status.st_size, status.st_mtime_ns
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_pack(path, sources):
+    " Decodes every PNG in sources into a new pack at path "
+    images = [read_png(source)[::-1] for source in sources]
+    names = [source.encode("utf-8") for source in sources]
+    offset = HEADER.size + sum(ENTRY.size + len(name) for name in names)
+    index, offsets = [], []
+    for source, name, pixels in zip(sources, names, images):
+        offset = _aligned(offset)
+        offsets.append(offset)
+        height, width = pixels.shape[:2]
+        index.append(ENTRY.pack(*_stamp(source), width, height, offset, len(name)) + name)
+        offset += pixels.nbytes
+
+    # Written aside and moved into place, so a game starting meanwhile never sees half a pack
+    partial = "%s.%d" % (path, os.getpid())
+    with open(partial, "wb") as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, VERSION, len(sources)))
+        pack_file.write(b"".join(index))
+        for start, pixels in zip(offsets, images):
+            pack_file.write(b"\0" * (start - pack_file.tell()))
+            pack_file.write(pixels.tobytes())
+    os.replace(partial, path)
+
+
+class AssetPack:
+    " A pack opened for reading "
+
+    def __init__(self, path):
+        with open(path, "rb") as pack_file:
+            # Copy on write, so ctypes can point at the pages; nothing ever writes to them
+            self._mmap = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("%s is not an asset pack" % path)
+        if version != VERSION:
+            raise ValueError("Unsupported asset pack version %s" % version)
+        # Source path to (size, modification time, width, height, offset)
+        self.entries = {}
+        offset = HEADER.size
+        for _ in range(count):
+            size, modified, width, height, start, length = ENTRY.unpack_from(self._mmap, offset)
+            offset += ENTRY.size
+            name = bytes(self._mmap[offset:offset + length]).decode("utf-8")
+            offset += length
+            self.entries[name] = size, modified, width, height, start
+
+    def fresh(self, sources):
+        " Whether the pack holds every one of sources, as they are now "
+        try:
+            return all(source in self.entries and self.entries[source][:2] == _stamp(source) for source in sources)
+        except OSError:
+            return False
+
+    def close(self):
+        self._mmap.close()
+
+    def image(self, source):
+        " The image decoded from source, its pixels still in the mapped file "
+        _, _, width, height, start = self.entries[source]
+        pixels = (ctypes.c_ubyte * (width * height * 4)).from_buffer(self._mmap, start)
+        return ImageData(width, height, "RGBA", pixels)
+
+
+def open_pack(path, sources):
+    """ The pack at path, first written again if it is missing, unreadable or
+        out of date with sources
+    """
+    try:
+        pack = AssetPack(path)
+        if pack.fresh(sources):
+            return pack
+        pack.close()
+    except (OSError, ValueError, struct.error):
+        pass
+    write_pack(path, sources)
+    return AssetPack(path)
@@ -0,0 +1,158 @@
+"""
+    Textures and sounds, loaded when they are first used and let go once
+    nothing needs them.
+
+    Anything that will want an asset takes a Handle for it up front, which
+    costs nothing, and calls get() when it actually needs the asset. Scenes
+    acquire the handles they draw and play with, and hold them for as long as
+    the scene is around. Assets no scene holds stay loaded in case they are
+    wanted again, until loading something else takes the total over the
+    budget. Then the least recently used of them are unloaded until it fits.
+
+    The budget is in megabytes, and can be set with
+    PYTHON_TACTICS_ASSET_BUDGET. What counts against it is an estimate of
+    what each asset decodes to, such as four bytes a pixel for textures.
+"""
+import os
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+
+from python_tactics import startup
+
+DEFAULT_BUDGET = 64
+
+
+class Handle:
+    """ An asset that may or may not be loaded yet. Handles that require
+        others load those first, and are unloaded along with them.
+    """
+
+    def __init__(self, assets, key, load, size=None, requires=()):
+        self.assets = assets
+        self.key = key
+        self.requires = tuple(requires)
+        self.dependents = []
+        self.asset = None
+        self.size = 0
+        self.references = 0
+        self._load, self._size = load, size
+        for required in self.requires:
+            required.dependents.append(self)
+
+    @property
+    def loaded(self):
+        return self.asset is not None
+
+    def get(self):
+        return self.assets.get(self)
+
+    def __repr__(self):
+        return "Handle(%r%s)" % (self.key, "" if self.loaded else ", unloaded")
+
+
+class Assets:
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = int(budget * 2 ** 20)
+        # Bytes the loaded assets take
+        self.used = 0
+        self._handles = {}
+        # Key to handle, least recently used first
+        self._loaded = OrderedDict()
+        # Owner id to (the handles it holds, the finalizer that releases them)
+        self._owners = {}
+
+    def handle(self, key, load, size=None, requires=()):
+        """ The handle for key, created the first time. load makes the asset
+            and size says how many bytes it takes.
+        """
+        found = self._handles.get(key)
+        if found is None:
+            found = self._handles[key] = Handle(self, key, load, size, requires)
+        return found
+
+    def get(self, handle):
+        " The handle's asset, loaded if it is not already "
+        for required in handle.requires:
+            self.get(required)
+        if handle.asset is None:
+            if handle._size:
+                with startup.span("load %s" % " ".join(os.path.basename(str(part)) for part in handle.key)):
+                    handle.asset = handle._load()
+            else:
+                handle.asset = handle._load()
+            handle.size = handle._size(handle.asset) if handle._size else 0
+            self.used += handle.size
+            self._loaded[handle.key] = handle
+            self._fit(handle)
+        else:
+            self._loaded.move_to_end(handle.key)
+        return handle.asset
+
+    def acquire(self, owner, handles):
+        " Keeps handles from being unloaded until owner is released or goes away "
+        held = []
+        for handle in handles:
+            held.extend(self._with_requirements(handle))
+        for handle in held:
+            handle.references += 1
+        if id(owner) in self._owners:
+            self._owners[id(owner)][0].extend(held)
+        else:
+            finalizer = weakref.finalize(owner, self._release, id(owner))
+            finalizer.atexit = False
+            self._owners[id(owner)] = held, finalizer
+
+    def release(self, owner, handles=None):
+        " Lets go of handles, or else everything, that owner acquired "
+        if id(owner) not in self._owners:
+            return
+        if handles is None:
+            self._owners[id(owner)][1]()
+            return
+        held = self._owners[id(owner)][0]
+        for handle in handles:
+            for released in self._with_requirements(handle):
+                held.remove(released)
+                released.references -= 1
+        self._fit()
+
+    def unload(self, handle):
+        """ Forgets the asset and everything loaded from it. pyglet frees
+            textures and sounds once nothing refers to them any more.
+        """
+        for dependent in handle.dependents:
+            if dependent.loaded:
+                self.unload(dependent)
+        del self._loaded[handle.key]
+        self.used -= handle.size
+        handle.asset, handle.size = None, 0
+
+    def _with_requirements(self, handle):
+        found = [handle]
+        for required in handle.requires:
+            found.extend(self._with_requirements(required))
+        return found
+
+    def _release(self, owner_id):
+        held, _ = self._owners.pop(owner_id)
+        for handle in held:
+            handle.references -= 1
+        self._fit()
+
+    def _fit(self, keep=None):
+        " Unloads unheld assets, least recently used first, until the rest fit the budget "
+        kept = set() if keep is None else {handle.key for handle in self._with_requirements(keep)}
+        while self.used > self.budget:
+            victim = next((handle for handle in self._loaded.values()
+                           if not handle.references and handle.size and handle.key not in kept), None)
+            if victim is None:
+                return
+            self.unload(victim)
+
+
+@lru_cache(maxsize=None)
+def assets():
+    " The game's assets, with the budget from the environment "
+    return Assets(float(os.environ.get("PYTHON_TACTICS_ASSET_BUDGET") or DEFAULT_BUDGET))
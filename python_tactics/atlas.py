@@ -0,0 +1,104 @@
+"""
+    Frames by name, from the atlas pages python_tactics.packer builds.
+
+    Frames are asked for as handles from python_tactics.assets. A page is
+    only loaded when a frame on it is first used, and unloading a page drops
+    its frames too. Every frame is a region of its page's texture, so
+    anything drawn from the same page can share a draw. Pages are uploaded
+    from an already decoded python_tactics.assetpack, kept with the other
+    files the game writes, rather than decoded from their PNGs every time.
+"""
+import json
+import os
+from functools import lru_cache
+
+from pyglet import image
+
+from python_tactics.assetpack import open_pack
+from python_tactics import startup
+from python_tactics.assets import assets
+from python_tactics.packer import MANIFEST, VERSION
+from python_tactics.paths import asset_to_file, data_path
+
+
+class Atlas:
+
+    def __init__(self, directory, manager, pack_path=None):
+        """ Pages are decoded into the pack at pack_path, if given, or else
+            straight from their PNGs each time they load
+        """
+        self.directory = directory
+        self.manager = manager
+        self.pack_path = pack_path
+        self._pack = None
+        path = os.path.join(directory, MANIFEST)
+        try:
+            with open(path) as manifest:
+                manifest = json.load(manifest)
+        except FileNotFoundError:
+            raise FileNotFoundError("No atlas manifest at %s, build one with python -m python_tactics atlas"
+                                    % path) from None
+        if manifest.get("version") != VERSION:
+            raise ValueError("%s is from another version of the packer, build it again" % path)
+        self._page_names = manifest["pages"]
+        self._frames = manifest["frames"]
+
+    def names(self, prefix=""):
+        " Names of the frames that start with prefix, in order "
+        return sorted((name for name in self._frames if name.startswith(prefix)), key=_natural)
+
+    def handle(self, name, flip_x=False):
+        " A handle for the frame as a region of its page, anchored as the manifest says "
+        entry = self._frames.get(name)
+        if entry is None:
+            raise KeyError("No frame named %r in the atlas" % name)
+        if flip_x:
+            unflipped = self.handle(name)
+            return self.manager.handle(("frame", self.directory, name, True),
+                                       lambda: unflipped.get().get_transform(flip_x=True), requires=(unflipped,))
+        page = self.page(entry["page"])
+        return self.manager.handle(("frame", self.directory, name, False),
+                                   lambda: _region(page.get(), entry), requires=(page,))
+
+    def frame(self, name, flip_x=False):
+        return self.handle(name, flip_x).get()
+
+    def sequence(self, prefix):
+        " Handles for the frames named prefix/0, prefix/1 and on, as a list "
+        numbered = [name for name in self.names(prefix + "/") if name[len(prefix) + 1:].isdigit()]
+        return [self.handle(name) for name in numbered]
+
+    def page(self, number):
+        path = os.path.join(self.directory, self._page_names[number])
+        return self.manager.handle(("page", path), lambda: self._load_page(path),
+                                   size=lambda texture: texture.width * texture.height * 4)
+
+    def _load_page(self, path):
+        if self.pack_path is None:
+            return image.load(path).get_texture()
+        if self._pack is None:
+            pages = [os.path.join(self.directory, name) for name in self._page_names]
+            with startup.span("open %s" % os.path.basename(self.pack_path)):
+                self._pack = open_pack(self.pack_path, pages)
+        return self._pack.image(path).get_texture()
+
+
+def _region(page, entry):
+    region = page.get_region(entry["x"], entry["y"], entry["width"], entry["height"])
+    region.anchor_x, region.anchor_y = entry["anchor_x"], entry["anchor_y"]
+    return region
+
+
+def _natural(name):
+    " Sorts blocks/2 before blocks/10 "
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in name.split("/")]
+
+
+@lru_cache(maxsize=None)
+def atlas():
+    " The atlas the game ships with "
+    return Atlas(asset_to_file("atlas"), assets(), data_path("cache", "atlas.pack"))
+
+
+def handle(name, flip_x=False):
+    return atlas().handle(name, flip_x)
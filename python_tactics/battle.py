@@ -0,0 +1,279 @@
+"""
+    The rules of a battle, with no dependency on pyglet.
+
+    A Battle holds the terrain, a record for every unit, who stands where,
+    what each team can see and when each unit acts next. Units act one at a
+    time in the order their initiative charges, faster units more often.
+    The active unit may either move somewhere within its speed, or attack an
+    enemy it can see within its range. A unit that can do neither must wait.
+    A team wins once every other team has been wiped out.
+
+    Actions go in through apply(), which returns the events they caused so a
+    front end can animate them. All randomness comes from the battle's own
+    random.Random, so a battle replays exactly given the same seed and
+    actions.
+
+    pack() turns everything but the terrain into bytes, and unpack() brings
+    it back given the same terrain.
+"""
+import random
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from python_tactics.forecast import Forecast, forecast_many
+from python_tactics.grid import TileGrid
+from python_tactics.initiative import NORMAL_HASTE, Initiative
+from python_tactics.occupancy import Occupancy
+from python_tactics.pathing import EMPTY, RangeCache
+from python_tactics.units import KINDS
+from python_tactics.visibility import Vision
+
+# Action kinds
+MOVE, ATTACK, WAIT = list(range(3))
+
+Action = namedtuple("Action", "kind unit i j")
+
+# Events returned by Battle.apply
+Moved = namedtuple("Moved", "unit path")
+Attacked = namedtuple("Attacked", "unit target damage health")
+Died = namedtuple("Died", "unit")
+TurnStarted = namedtuple("TurnStarted", "team unit")
+Won = namedtuple("Won", "team")
+
+UNIT = np.dtype([("kind", "u1"), ("team", "i1"), ("health", "i2"), ("i", "i2"), ("j", "i2")])
+
+# team count, turn, winner or EMPTY, unit count and initiative time, then the units, then
+# the tick each unit is next ready on and its haste, then the random state
+PACKED = struct.Struct("<BbbHq")
+READY = np.dtype("<i8")
+HASTE = np.dtype("<u2")
+# random.Random state: version, 624 words and an index, then whether there is a spare gauss and its value
+RANDOM_STATE = struct.Struct("<B625I?d")
+
+
+def starting_positions(width, depth, team_size):
+    """ (i, j) positions for teams of team_size, centred along each edge of a
+        width by depth map in the order west, east, north, south.
+    """
+    starting_i = int((width - team_size) / 2)
+    starting_j = int((depth - team_size) / 2)
+    return [[(i_side, starting_j + offset) for offset in range(team_size)] for i_side in (0, width - 1)] \
+         + [[(starting_i + offset, j_side) for offset in range(team_size)] for j_side in (0, depth - 1)]
+
+
+def damage(rng, strength, defense):
+    " Rolls the damage of one attack "
+    attack = rng.randrange(strength)
+    block = rng.randrange(defense)
+    return max(1, block - attack)
+
+
+class Battle:
+
+    def __init__(self, grid, team_count, rng=None, kinds=KINDS):
+        self.grid = grid
+        self.team_count = team_count
+        self.rng = rng if rng is not None else random.Random()
+        # Stats for each kind of unit, which balance sweeps swap out
+        self.kinds = kinds
+        # Rolls the damage of an attack, which searches swap for something deterministic
+        self.damage = damage
+        self.units = np.zeros(0, dtype=UNIT)
+        self.occupancy = Occupancy(grid.shape, team_count)
+        self.vision = Vision(grid, team_count)
+        self.ranges = RangeCache(grid)
+        self.initiative = Initiative()
+        # The unit whose turn it is, and its team
+        self.active = EMPTY
+        self.turn = 0
+        self.winner = None
+
+    @classmethod
+    def skirmish(cls, width=10, depth=10, team_size=2, team_count=2, seed=None, kinds=KINDS, teams=None):
+        """ A battle on open ground with each team lined up along its own edge.
+            teams lists the kind of every unit on each team, and by default
+            each team alternates between kinds as in the game scene.
+        """
+        if teams is None:
+            teams = [[count % len(kinds) for count in range(team_size)]] * team_count
+        battle = cls(TileGrid(width, depth, 0, 0, 1, 1), len(teams), random.Random(seed), kinds)
+        positions = starting_positions(width, depth, max(len(team) for team in teams))
+        for team, (members, spots) in enumerate(zip(teams, positions)):
+            for kind, (i, j) in zip(members, spots):
+                battle.spawn(kind, team, i, j)
+        return battle
+
+    def copy(self):
+        """ An independent copy of the battle to play ahead on. Terrain and
+            fields of view are shared, so the terrain must not change while
+            copies are in use.
+        """
+        other = Battle.__new__(Battle)
+        other.__dict__.update(self.__dict__)
+        other.rng = random.Random()
+        other.rng.setstate(self.rng.getstate())
+        other.units = self.units.copy()
+        other.occupancy = self.occupancy.copy()
+        other.vision = self.vision.copy()
+        other.ranges = RangeCache(self.grid)
+        other.initiative = self.initiative.copy()
+        return other
+
+    def pack(self):
+        " The state of the battle as bytes, leaving out the terrain "
+        version, words, gauss = self.rng.getstate()
+        winner = EMPTY if self.winner is None else self.winner
+        # Units that have died, or never joined the initiative, are packed as never ready
+        ready = np.full(len(self.units), EMPTY, dtype=READY)
+        haste = np.full(len(self.units), NORMAL_HASTE, dtype=HASTE)
+        for unit, tick in enumerate(self.initiative.ready):
+            if tick is not None:
+                ready[unit], haste[unit] = tick, self.initiative.haste[unit]
+        return (PACKED.pack(self.team_count, self.turn, winner, len(self.units), self.initiative.now)
+                + self.units.astype(UNIT.newbyteorder("<")).tobytes()
+                + ready.tobytes() + haste.tobytes()
+                + RANDOM_STATE.pack(version, *words, gauss is not None, gauss or 0.0))
+
+    @classmethod
+    def unpack(cls, data, grid, kinds=KINDS):
+        " A battle from the bytes of pack(), fought over grid "
+        team_count, turn, winner, unit_count, now = PACKED.unpack_from(data)
+        offset = PACKED.size
+        units = np.frombuffer(data, dtype=UNIT.newbyteorder("<"), count=unit_count, offset=offset)
+        offset += units.nbytes
+        ready = np.frombuffer(data, dtype=READY, count=unit_count, offset=offset)
+        offset += ready.nbytes
+        haste = np.frombuffer(data, dtype=HASTE, count=unit_count, offset=offset)
+        offset += haste.nbytes
+        state = RANDOM_STATE.unpack_from(data, offset)
+        rng = random.Random()
+        rng.setstate((state[0], tuple(state[1:626]), state[627] if state[626] else None))
+        battle = cls(grid, team_count, rng, kinds)
+        battle.units = units.astype(UNIT)
+        battle.initiative.now = now
+        for unit, record in enumerate(battle.units):
+            if record["health"] > 0:
+                team, i, j = int(record["team"]), int(record["i"]), int(record["j"])
+                battle.occupancy.spawn(unit, team, i, j)
+                battle.vision.place(unit, team, (i, j), kinds[record["kind"]].sight)
+                battle.initiative.add(unit, kinds[record["kind"]].speed, int(ready[unit]), int(haste[unit]))
+        battle.active = battle.initiative.peek()
+        battle.turn = turn
+        battle.winner = None if winner == EMPTY else winner
+        return battle
+
+    def spawn(self, kind, team, i, j):
+        " Adds a unit of kind at full health, returning its id "
+        stats = self.kinds[kind]
+        unit = len(self.units)
+        self.units = np.append(self.units, np.array([(kind, team, stats.health, i, j)], dtype=UNIT))
+        self.occupancy.spawn(unit, team, i, j)
+        self.vision.place(unit, team, (i, j), stats.sight)
+        self.initiative.add(unit, stats.speed)
+        self.active = self.initiative.peek()
+        self.turn = int(self.units[self.active]["team"])
+        return unit
+
+    def stats(self, unit):
+        return self.kinds[self.units[unit]["kind"]]
+
+    def alive(self, unit):
+        return self.occupancy.alive(unit)
+
+    def position(self, unit):
+        return self.occupancy.tile_of(unit)
+
+    def movement(self, unit):
+        " The MovementRange of a unit "
+        return self.ranges.get(self.position(unit), self.stats(unit).speed, self.occupancy.teams,
+                               int(self.units[unit]["team"]), self.occupancy.version)
+
+    def targets(self, unit):
+        " Enemies the unit can see and reach with an attack "
+        reach = self.stats(unit).range
+        origin_i, origin_j = self.position(unit)
+        found = []
+        for enemy in self.occupancy.enemies(int(self.units[unit]["team"])):
+            i, j = self.occupancy.tile_of(enemy)
+            if abs(i - origin_i) + abs(j - origin_j) <= reach and self.vision.unit_sees(unit, i, j):
+                found.append(enemy)
+        return found
+
+    def forecasts(self, unit):
+        " Forecast of an attack by unit on each of its targets, by target "
+        targets = self.targets(unit)
+        strength = self.stats(unit).strength
+        defenses = [self.stats(target).defense for target in targets]
+        healths = self.units["health"][targets]
+        outcomes = forecast_many([strength] * len(targets), defenses, healths)
+        return {target: Forecast(int(least), int(most), float(expected), float(kill))
+                for target, least, most, expected, kill in zip(targets, *outcomes)}
+
+    def legal_actions(self):
+        " Every action the active unit may take "
+        if self.winner is not None or self.active is None:
+            return []
+        unit = self.active
+        actions = [Action(MOVE, unit, i, j) for i, j in self.movement(unit)]
+        actions.extend(Action(ATTACK, unit, *self.position(target)) for target in self.targets(unit))
+        return actions or [Action(WAIT, unit, EMPTY, EMPTY)]
+
+    def is_legal(self, action):
+        if self.winner is not None or action.unit != self.active:
+            return False
+        if action.kind == WAIT:
+            return self.legal_actions() == [action]
+        if action.kind == MOVE:
+            return (action.i, action.j) in self.movement(action.unit)
+        if action.kind == ATTACK:
+            if not self.grid.in_bounds(action.i, action.j):
+                return False
+            return self.occupancy.at(action.i, action.j) in self.targets(action.unit)
+        return False
+
+    def apply(self, action):
+        """ Performs action for the active unit, then passes the turn on to the
+            next unit to finish charging. Raises ValueError if the action is
+            not legal.
+        """
+        if not self.is_legal(action):
+            raise ValueError("Illegal action %s" % (action,))
+        events = []
+        if action.kind == MOVE:
+            events.append(self._move(action.unit, action.i, action.j))
+        elif action.kind == ATTACK:
+            events.extend(self._attack(action.unit, self.occupancy.at(action.i, action.j)))
+        events.append(self._end_turn())
+        return events
+
+    def _move(self, unit, i, j):
+        team = int(self.units[unit]["team"])
+        path = self.movement(unit).path_to(i, j)
+        self.occupancy.move(unit, i, j)
+        self.units[unit]["i"], self.units[unit]["j"] = i, j
+        self.vision.place(unit, team, (i, j), self.stats(unit).sight)
+        return Moved(unit, path)
+
+    def _attack(self, unit, target):
+        hit = self.damage(self.rng, self.stats(unit).strength, self.stats(target).defense)
+        health = max(0, int(self.units[target]["health"]) - hit)
+        self.units[target]["health"] = health
+        events = [Attacked(unit, target, hit, health)]
+        if health == 0:
+            self.occupancy.kill(target)
+            self.vision.remove(target)
+            self.initiative.remove(target)
+            events.append(Died(target))
+        return events
+
+    def _end_turn(self):
+        acting = self.turn
+        self.initiative.acted(self.active)
+        if not any(self.occupancy.members(team) for team in range(self.team_count) if team != acting):
+            self.winner = acting
+            return Won(acting)
+        self.active = self.initiative.peek()
+        self.turn = int(self.units[self.active]["team"])
+        return TurnStarted(self.turn, self.active)
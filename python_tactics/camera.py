@@ -44,6 +44,11 @@ class Camera:
         " How far away from the origin the camera has gone "
         return self.y -self.origin_y
 
+    @property
+    def heading(self):
+        " How much further the camera has to pan to reach its target "
+        return self.target_x - self.x, self.target_y - self.y
+
     def pan_left(self, length):
         " Move the camera left by length "
         self._pan(length, -pi/2)
@@ -111,6 +116,17 @@ class Camera:
         " Sets up camera to focus on target x and y "
         self.target_x, self.target_y = int(x), int(y)
 
+    def view_bounds(self, width, height):
+        " The (left, bottom, right, top) of the world currently visible, as set up in focus "
+        half_width = self.scale * width / height
+        return self.x - half_width, self.y - self.scale, self.x + half_width, self.y + self.scale
+
+    def window_to_world(self, x, y, width, height):
+        " Returns the world x and y under the window position x, y, undoing the projection set in focus "
+        aspect = width / height
+        return (self.x + (2 * x / width - 1) * self.scale * aspect,
+                self.y + (2 * y / height - 1) * self.scale)
+
     def to_y_from_bottom(self, y):
         "Returns a y that is y pixels above the bottom the window"
         return self.y - 300 + y
@@ -0,0 +1,63 @@
+"""
+    Exact outcomes of attacks.
+
+    An attack rolls attack uniformly from [0, strength) and block uniformly
+    from [0, defense), and deals max(1, block - attack). The distribution of
+    that is worked out once per (strength, defense) pair and cached. Many
+    attacks are then forecast at once by stacking those distributions into a
+    matrix, one row per attack, and working out expected damage and the
+    chance of a kill from it with a couple of array operations.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+Forecast = namedtuple("Forecast", "least most expected kill")
+
+
+@lru_cache(maxsize=None)
+def distribution(strength, defense):
+    """ Read-only array whose kth entry is the chance an attack with strength
+        against defense deals k damage
+    """
+    rolls = np.subtract.outer(np.arange(defense), np.arange(strength)).clip(min=1)
+    chances = np.bincount(rolls.ravel()) / rolls.size
+    chances.flags.writeable = False
+    return chances
+
+
+@lru_cache(maxsize=None)
+def expected_damage(strength, defense):
+    chances = distribution(strength, defense)
+    return float(chances @ np.arange(len(chances)))
+
+
+def forecast_many(strengths, defenses, healths):
+    """ Forecasts one attack per entry of the three equally long sequences.
+        Returns the least and most damage each could deal, the expected
+        damage and the chance it kills, as arrays.
+    """
+    rows = [distribution(int(strength), int(defense)) for strength, defense in zip(strengths, defenses)]
+    if not rows:
+        empty = np.zeros(0)
+        return empty.astype(int), empty.astype(int), empty, empty
+    width = max(len(row) for row in rows)
+    chances = np.zeros((len(rows), width + 1))
+    for index, row in enumerate(rows):
+        chances[index, :len(row)] = row
+    expected = chances @ np.arange(width + 1)
+    # at_least[n, k] is the chance attack n deals k or more
+    at_least = chances[:, ::-1].cumsum(axis=1)[:, ::-1]
+    healths = np.clip(np.asarray(healths, dtype=np.intp), 0, width)
+    kill = at_least[np.arange(len(rows)), healths]
+    possible = chances > 0
+    least = possible.argmax(axis=1)
+    most = width - possible[:, ::-1].argmax(axis=1)
+    return least, most, expected, kill
+
+
+def forecast(strength, defense, health):
+    " Forecast of a single attack on a defender with health left "
+    least, most, expected, kill = forecast_many([strength], [defense], [health])
+    return Forecast(int(least[0]), int(most[0]), float(expected[0]), float(kill[0]))
@@ -0,0 +1,86 @@
+r"""
+    Per-tile data for a rectangular isometric map, stored as NumPy arrays
+    indexed by (i, j), along with the closed-form conversions between tile
+    coordinates and screen coordinates.
+
+    A tile (i, j) is drawn with the centre of its top face at
+
+        x = start_x + (i - j) * x_offset
+        y = start_y - (i + j) * y_offset
+
+    where x_offset and y_offset are half the width and a quarter of the
+    height of the tile image. Inverting this gives
+
+        i = ((x - start_x) / x_offset + (start_y - y) / y_offset) / 2
+        j = ((start_y - y) / y_offset - (x - start_x) / x_offset) / 2
+
+    Nothing in here depends on pyglet, so it can be shared with headless code.
+"""
+from math import floor
+
+import numpy as np
+
+# Terrain flags
+WALKABLE = 0x01
+OPAQUE = 0x02
+
+
+class TileGrid:
+    """ Terrain for a width by depth map. Width is in terms of i, depth in
+        terms of j, matching RectangularMap.
+    """
+
+    def __init__(self, width, depth, start_x, start_y, x_offset, y_offset):
+        self.width, self.depth = width, depth
+        self.start_x, self.start_y = start_x, start_y
+        self.x_offset, self.y_offset = x_offset, y_offset
+        self.block = np.zeros((width, depth), dtype=np.uint8)
+        self.flags = np.full((width, depth), WALKABLE, dtype=np.uint8)
+        self.height = np.zeros((width, depth), dtype=np.uint8)
+        self.cost = np.ones((width, depth), dtype=np.uint8)
+
+    @property
+    def shape(self):
+        return self.width, self.depth
+
+    @property
+    def walkable(self):
+        " Boolean mask of every tile a unit could stand on "
+        return (self.flags & WALKABLE) != 0
+
+    def in_bounds(self, i, j):
+        return 0 <= i < self.width and 0 <= j < self.depth
+
+    def ij_to_xy(self, i, j):
+        " Screen position of the centre of the top face of tile (i, j) "
+        return (self.start_x + (i - j) * self.x_offset,
+                self.start_y - (i + j) * self.y_offset)
+
+    def xy_to_ij(self, x, y):
+        """ The tile whose top face contains the screen position x, y.
+            The result is not bounds checked.
+        """
+        u = (x - self.start_x) / self.x_offset
+        v = (self.start_y - y) / self.y_offset
+        # Inside a top face |di| and |dj| are both at most 1/2, so rounding
+        # each axis independently lands on the right diamond
+        return floor((v + u) / 2 + 0.5), floor((v - u) / 2 + 0.5)
+
+    def ij_to_xy_array(self, i, j):
+        " Vectorized ij_to_xy over arrays of i and j "
+        i, j = np.asarray(i), np.asarray(j)
+        return (self.start_x + (i - j) * self.x_offset,
+                self.start_y - (i + j) * self.y_offset)
+
+    def xy_to_ij_array(self, x, y):
+        " Vectorized xy_to_ij over arrays of x and y, returning int arrays "
+        u = (np.asarray(x, dtype=np.float64) - self.start_x) / self.x_offset
+        v = (self.start_y - np.asarray(y, dtype=np.float64)) / self.y_offset
+        i = np.floor((v + u) / 2 + 0.5).astype(np.intp)
+        j = np.floor((v - u) / 2 + 0.5).astype(np.intp)
+        return i, j
+
+    def in_bounds_array(self, i, j):
+        " Vectorized in_bounds, returning a boolean mask "
+        i, j = np.asarray(i), np.asarray(j)
+        return (0 <= i) & (i < self.width) & (0 <= j) & (j < self.depth)
@@ -0,0 +1,160 @@
+"""
+    Text for the HUD, drawn as textured quads from a glyph atlas.
+
+    pyglet's Label lays its text out again whenever it changes, and can only
+    share a draw with other labels in the same group. Health readouts and
+    damage numbers only ever show a few characters from a small set. So those
+    glyphs are rendered once, into a single font texture. Each piece of text
+    is then a fixed number of quads in a shared Batch, and changing the text
+    only rewrites those quads.
+"""
+from functools import lru_cache
+
+from pyglet import font
+from pyglet.gl import GL_ONE_MINUS_SRC_ALPHA, GL_QUADS, GL_SRC_ALPHA
+from pyglet.sprite import SpriteGroup
+
+GLYPHS = "0123456789/-+ "
+WHITE = 255, 255, 255, 255
+
+
+class GlyphAtlas:
+    " The glyphs of one font for a fixed set of characters, all in one texture "
+
+    def __init__(self, font_name, font_size, bold=False, characters=GLYPHS):
+        loaded = font.load(font_name, font_size, bold=bold)
+        glyphs = loaded.get_glyphs(characters)
+        textures = {glyph.owner.id for glyph in glyphs}
+        if len(textures) != 1:
+            raise ValueError("The glyphs for %r did not fit in one texture" % characters)
+        self.texture = glyphs[0].owner
+        # Character to ((left, bottom, right, top) relative to the pen, tex coords, advance)
+        self._glyphs = {character: (glyph.vertices, glyph.tex_coords, glyph.advance)
+                        for character, glyph in zip(characters, glyphs)}
+
+    def group(self, parent=None):
+        return SpriteGroup(self.texture, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, parent)
+
+    def width(self, text):
+        return sum(self.glyph(character)[2] for character in text)
+
+    def glyph(self, character):
+        found = self._glyphs.get(character)
+        if found is None:
+            raise ValueError("No glyph for %r in the atlas" % character)
+        return found
+
+
+@lru_cache(maxsize=None)
+def glyph_atlas(font_name='Times New Roman', font_size=18, bold=True):
+    " The shared atlas for a font, rendered the first time it is asked for "
+    return GlyphAtlas(font_name, font_size, bold)
+
+
+class Readout:
+    """ A line of up to capacity characters from an atlas, centred on x with
+        its baseline at y. Unused quads are collapsed to nothing.
+    """
+
+    def __init__(self, atlas, text, x, y, batch, group=None, capacity=8, color=WHITE):
+        self.atlas = atlas
+        self.capacity = capacity
+        self._text = ""
+        self._x, self._y = x, y
+        self._visible = True
+        self._vertex_list = batch.add(4 * capacity, GL_QUADS, atlas.group(group),
+                                      "v2f/dynamic", "t3f/dynamic", ("c4B/dynamic", color * (4 * capacity)))
+        self.text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if len(text) > self.capacity:
+            raise ValueError("%r is longer than the %d characters this readout holds" % (text, self.capacity))
+        if text != self._text:
+            self._text = text
+            tex_coords = []
+            for character in text:
+                tex_coords.extend(self.atlas.glyph(character)[1])
+            tex_coords.extend([0.0] * (12 * (self.capacity - len(text))))
+            self._vertex_list.tex_coords[:] = tex_coords
+            self._place()
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, x):
+        self._x = x
+        self._place()
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, y):
+        self._y = y
+        self._place()
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if visible != self._visible:
+            self._visible = visible
+            self._place()
+
+    @property
+    def color(self):
+        return tuple(self._vertex_list.colors[:4])
+
+    @color.setter
+    def color(self, color):
+        self._vertex_list.colors[:] = tuple(color) * (4 * self.capacity)
+
+    def delete(self):
+        self._vertex_list.delete()
+
+    def _place(self):
+        vertices = []
+        if self._visible:
+            # Whole pixels keep the glyphs sharp
+            pen_x, pen_y = int(self._x - self.atlas.width(self._text) / 2), int(self._y)
+            for character in self._text:
+                (left, bottom, right, top), _, advance = self.atlas.glyph(character)
+                left, bottom, right, top = pen_x + left, pen_y + bottom, pen_x + right, pen_y + top
+                vertices.extend((left, bottom, right, bottom, right, top, left, top))
+                pen_x += advance
+        vertices.extend([0.0] * (8 * self.capacity - len(vertices)))
+        self._vertex_list.vertices[:] = vertices
+
+
+class Floater:
+    " A readout that rises and fades away over duration seconds "
+
+    RISE = 30
+
+    def __init__(self, readout, duration=1.0):
+        self.readout = readout
+        self.duration = duration
+        self.age = 0.0
+        self._start_y = readout.y
+        self._color = readout.color
+
+    @property
+    def done(self):
+        return self.age >= self.duration
+
+    def tick(self, delta):
+        self.age = min(self.duration, self.age + delta)
+        progress = self.age / self.duration
+        self.readout.y = self._start_y + self.RISE * progress
+        red, green, blue, alpha = self._color
+        self.readout.color = red, green, blue, int(alpha * (1 - progress))
@@ -0,0 +1,90 @@
+"""
+    Turn order by charge time.
+
+    Every unit charges towards THRESHOLD at a rate of its speed times its
+    haste (a percentage, 100 being normal), and acts when it gets there.
+    Rather than ticking every unit's charge, the tick each unit will next be
+    ready on is worked out up front and kept in a heap, so finding who acts
+    next costs O(log n) however many units there are. Ties go to the lowest
+    unit id.
+
+    Delays and changes of haste push a fresh heap entry and bump the unit's
+    stamp. Entries with an old stamp are thrown away when they reach the top
+    of the heap, instead of being searched for and removed.
+"""
+import heapq
+
+THRESHOLD = 1000
+NORMAL_HASTE = 100
+
+
+class Initiative:
+
+    def __init__(self):
+        self.now = 0
+        # By unit id; ready is None once a unit has been removed
+        self.ready = []
+        self.haste = []
+        self._speed = []
+        self._stamp = []
+        # (ready, unit, stamp)
+        self._heap = []
+
+    def copy(self):
+        other = Initiative.__new__(Initiative)
+        other.now = self.now
+        other.ready, other.haste = list(self.ready), list(self.haste)
+        other._speed, other._stamp = list(self._speed), list(self._stamp)
+        other._heap = list(self._heap)
+        return other
+
+    def add(self, unit, speed, ready=None, haste=NORMAL_HASTE):
+        " Starts scheduling unit, by default with no charge "
+        if unit >= len(self.ready):
+            grow = unit + 1 - len(self.ready)
+            self.ready.extend([None] * grow)
+            self.haste.extend([NORMAL_HASTE] * grow)
+            self._speed.extend([0] * grow)
+            self._stamp.extend([0] * grow)
+        self._speed[unit] = speed
+        self.haste[unit] = haste
+        self._schedule(unit, self.now + self.charge_time(unit) if ready is None else ready)
+
+    def remove(self, unit):
+        self.ready[unit] = None
+        self._stamp[unit] += 1
+
+    def charge_time(self, unit):
+        " Ticks the unit takes to charge fully from nothing "
+        rate = self._speed[unit] * self.haste[unit]
+        return -(-THRESHOLD * NORMAL_HASTE // max(1, rate))
+
+    def peek(self):
+        " The unit that acts next, or None if there are none "
+        heap = self._heap
+        while heap:
+            _, unit, stamp = heap[0]
+            if stamp == self._stamp[unit]:
+                return unit
+            heapq.heappop(heap)
+        return None
+
+    def acted(self, unit):
+        " Moves time on to when unit acted, and starts it charging again "
+        self.now = self.ready[unit]
+        self._schedule(unit, self.now + self.charge_time(unit))
+
+    def delay(self, unit, ticks):
+        self._schedule(unit, self.ready[unit] + ticks)
+
+    def set_haste(self, unit, haste):
+        " Changes how fast a unit charges, keeping the charge it already has "
+        remaining = max(0, self.ready[unit] - self.now)
+        old = self.haste[unit]
+        self.haste[unit] = haste
+        self._schedule(unit, self.now + -(-remaining * old // max(1, haste)))
+
+    def _schedule(self, unit, ready):
+        self.ready[unit] = ready
+        self._stamp[unit] += 1
+        heapq.heappush(self._heap, (ready, unit, self._stamp[unit]))
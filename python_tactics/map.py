@@ -1,15 +1,60 @@
+import numpy as np
 import pyglet
-from pyglet.graphics import Batch
+from pyglet.gl import GL_ONE_MINUS_SRC_ALPHA, GL_QUADS, GL_SRC_ALPHA
+from pyglet.sprite import SpriteGroup
 
+from python_tactics.atlas import atlas
+from python_tactics.battle import starting_positions
+from python_tactics.grid import TileGrid
+from python_tactics.mapfile import MapFile, write_map
 from python_tactics.new_sprite import Direction
-from python_tactics.sprite import PixelAwareSprite
-from python_tactics.util import find_path, load_sprite_asset
+
+
+class Chunk:
+    """ A square block of the map's tiles, drawn with a single vertex list.
+        Geometry is only built the first time the chunk is on screen.
+    """
+
+    def __init__(self, i, j, size, width, depth):
+        self.i, self.j = i, j
+        self.end_i, self.end_j = min(i + size, width), min(j + size, depth)
+        self.vertex_list = None
+        # The (i, j) of each of the chunk's tiles, in vertex list order
+        self.tiles = None
+
+    @property
+    def built(self):
+        return self.vertex_list is not None
+
+    def colors(self):
+        " A writable (tiles, vertices, rgba) view of this chunk's colors "
+        return np.frombuffer(self.vertex_list.colors, dtype=np.uint8).reshape(-1, 4, 4)
+
+    def delete(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
 
 
 class RectangularMap:
+    CHUNK_SIZE = 16
+    GRASS = 12
+    # Built chunks further than this many screens away from the view have their geometry released
+    EVICT_MARGIN = 1
+    # How many chunks ahead of a moving camera may be built each frame
+    PREFETCH_PER_FRAME = 2
+
     NORMAL_COLOR = 255, 255, 255
     SINGLE_HIGHLIGHT_COLOR = 100, 100, 100
     RADIUS_HIGHLIGHT_COLOR = 150, 150, 150
+    ATTACK_HIGHLIGHT_COLOR = 255, 150, 150
+    THREAT_HIGHLIGHT_COLOR = 255, 210, 210
+    FOG_COLOR = 70, 70, 110
+
+    # Color layers, in the order they are composited. Later layers cover earlier ones.
+    FOG_LAYER, THREAT_LAYER, MOVE_LAYER, ATTACK_LAYER, CURSOR_LAYER = list(range(5))
+    LAYER_COLORS = (FOG_COLOR, THREAT_HIGHLIGHT_COLOR, RADIUS_HIGHLIGHT_COLOR,
+                    ATTACK_HIGHLIGHT_COLOR, SINGLE_HIGHLIGHT_COLOR)
 
     r"""
     Creates a game map of size width by depth. The map lives in the (x, y) of the game, but thinks in terms of (i, j).
@@ -27,111 +72,228 @@ class RectangularMap:
     Width is in terms of i, and depth is in terms of j.
     """
 
-    blocks_sheet = pyglet.image.ImageGrid(load_sprite_asset("blocks"), 1, 101)
-    grass_img = blocks_sheet[12]
-
     def __init__(self, width, depth, start_x, start_y):
+        blocks = [block.get() for block in self.handles()]
+        self.grass_img = blocks[self.GRASS]
         self._width, self._depth = width, depth
-        self._start_x, self._start_y = start_x, start_y
-        self._sprite_batch = Batch()
-        self._sprites, self._ij_to_xy, self._xy_to_ij = self._generate()
-        self._last_highlighted = None
-        self._radius_highlights = []
-
-    def _generate(self):
         # These values are based on our grass image, which is currently a 64*64 isomatric block
         # Each tile in our map shifts to the left or right a full 1/2 of the grass image
         # but as it moves down our map, it's only moving 1/4 of the image up or down.
         # This is because the top face of the tile only takes up 1/2 of the image, so 1/2 * 1/2
-        x_offset, y_offset = self.grass_img.width / 2, self.grass_img.height / 4
+        self.grid = TileGrid(width, depth, start_x, start_y,
+                             self.grass_img.width / 2, self.grass_img.height / 4)
+        self.grid.block[:] = self.GRASS
+        self._colors = np.full(self.grid.shape + (3,), self.NORMAL_COLOR, dtype=np.uint8)
+        if len({block.owner.id for block in blocks}) != 1:
+            raise ValueError("The blocks are spread over more than one atlas page")
+        self._texture_group = SpriteGroup(blocks[0].owner, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self._tex_coords = np.array([block.tex_coords for block in blocks], dtype=np.float32)
+        self._chunk_lookup, self._chunks, self._chunk_bounds = self._generate()
+        self._built = set()
+        # Each layer is a mask of the tiles it covers and either one color or a color per tile
+        self._layers = [(np.zeros(self.grid.shape, dtype=bool), color) for color in self.LAYER_COLORS]
+        # The tile the cursor layer covers, so moving it only touches the old and new tiles
+        self._cursor = None
+
+    @staticmethod
+    def handles():
+        " The frames of every block, by block number "
+        return atlas().sequence("blocks")
+
+    @classmethod
+    def load(cls, path, start_x, start_y):
+        " Creates a map from the terrain in a map file "
+        source = MapFile(path)
+        try:
+            game_map = cls(source.width, source.depth, start_x, start_y)
+            # Terrain is a few bytes a tile and pathing needs all of it. Only the
+            # geometry, which is far bigger, waits for the camera.
+            for chunk_i in range(source.chunks_wide):
+                for chunk_j in range(source.chunks_deep):
+                    source.read_into(game_map.grid, chunk_i, chunk_j)
+        finally:
+            source.close()
+        return game_map
+
+    @classmethod
+    def from_terrain(cls, terrain, start_x, start_y):
+        " Creates a map with a copy of the terrain of another TileGrid "
+        game_map = cls(terrain.width, terrain.depth, start_x, start_y)
+        for field in ("block", "flags", "height", "cost"):
+            getattr(game_map.grid, field)[:] = getattr(terrain, field)
+        return game_map
+
+    def save(self, path):
+        write_map(path, self.grid, self.CHUNK_SIZE)
+
+    def _generate(self):
+        """ Lays out the chunks, both in i-major order for lookups and in back to front
+            order for drawing, along with the world space box each one covers
+        """
+        size = self.CHUNK_SIZE
+        lookup = [Chunk(i, j, size, self._width, self._depth)
+                  for i in range(0, self._width, size) for j in range(0, self._depth, size)]
+        # Tiles lower on screen overlap the ones behind them, so draw in order of i + j
+        chunks = sorted(lookup, key=lambda chunk: chunk.i + chunk.j)
+        first_i, first_j, last_i, last_j = (np.array([getattr(c, a) for c in chunks])
+                                            for a in ("i", "j", "end_i", "end_j"))
+        last_i, last_j = last_i - 1, last_j - 1
         # The center of it's top face is 1/2 way over from the left and 3/4 from the top of the image
-        self.grass_img.anchor_x = int(self.grass_img.width / 2)
-        self.grass_img.anchor_y = int(self.grass_img.height * (3/4))
-        sprites = {}
-        ij_to_xy = {}
-        xy_to_ij = {}
-        grid = [(i, j) for i in range(self._width) for j in range(self._depth)]
-        for i, j in grid:
-            x = self._start_x + ((i - j) * x_offset)
-            y = self._start_y - ((i + j) * y_offset)
-            sprites[(i, j)] = PixelAwareSprite(self.grass_img, x, y, batch=self._sprite_batch)
-            ij_to_xy[(i, j)] = (x, y)
-            xy_to_ij[(x, y)] = (i, j)
-        return sprites, ij_to_xy, xy_to_ij
-
-    def draw(self):
-        self._sprite_batch.draw()
+        anchor_x, anchor_y = self.grass_img.width / 2, self.grass_img.height * (3/4)
+        left, _ = self.grid.ij_to_xy_array(first_i, last_j)
+        right, _ = self.grid.ij_to_xy_array(last_i, first_j)
+        _, bottom = self.grid.ij_to_xy_array(last_i, last_j)
+        _, top = self.grid.ij_to_xy_array(first_i, first_j)
+        bounds = np.stack([left - anchor_x, bottom - anchor_y,
+                           right + self.grass_img.width - anchor_x, top + self.grass_img.height - anchor_y])
+        return lookup, chunks, bounds
 
-    def highlight(self, i, j):
-        if i < 0  or i >= self._width or j < 0 or j >= self._depth:
-            return None
-        if self._last_highlighted:
-            color = self.RADIUS_HIGHLIGHT_COLOR if self._last_highlighted in self._radius_highlights else self.NORMAL_COLOR
-            self._sprites[self._last_highlighted].color = color
-        self._sprites[(i, j)].color = self.SINGLE_HIGHLIGHT_COLOR
-        self._last_highlighted = (i, j)
-        return i, j
+    def _build_chunk(self, chunk):
+        i, j = np.mgrid[chunk.i:chunk.end_i, chunk.j:chunk.end_j]
+        order = np.argsort((i + j).ravel(), kind="stable")
+        i, j = chunk.tiles = i.ravel()[order], j.ravel()[order]
+
+        x, y = self.grid.ij_to_xy_array(i, j)
+        left, bottom = x - self.grass_img.width / 2, y - self.grass_img.height * (3/4)
+        right, top = left + self.grass_img.width, bottom + self.grass_img.height
+        vertices = np.stack([left, bottom, right, bottom, right, top, left, top], axis=1)
+        tex_coords = self._tex_coords[self.grid.block[i, j]]
+        colors = np.empty((order.size, 4, 4), dtype=np.uint8)
+        colors[:, :, :3] = self._colors[i, j][:, np.newaxis]
+        colors[:, :, 3] = 255
+        chunk.vertex_list = pyglet.graphics.vertex_list(
+            order.size * 4,
+            ("v2f/static", vertices.ravel().tolist()),
+            ("t3f/static", tex_coords.ravel().tolist()),
+            ("c4B/stream", colors.ravel().tolist()))
+
+    def draw(self, bounds, lead=(0, 0)):
+        """ Draws the chunks which overlap the world space (left, bottom, right, top) bounds.
+            lead is how far the camera still has to travel; chunks along it are built
+            ahead of time, and chunks left far behind are released.
+        """
+        self._texture_group.set_state()
+        for index in self._overlapping(bounds):
+            chunk = self._chunks[index]
+            if not chunk.built:
+                self._build(index)
+            chunk.vertex_list.draw(GL_QUADS)
+        self._texture_group.unset_state()
+        self._stream(bounds, lead)
+
+    def _overlapping(self, bounds):
+        left, bottom, right, top = bounds
+        chunk_left, chunk_bottom, chunk_right, chunk_top = self._chunk_bounds
+        return np.flatnonzero((chunk_left < right) & (chunk_right > left) & (chunk_bottom < top) & (chunk_top > bottom))
+
+    def _build(self, index):
+        self._build_chunk(self._chunks[index])
+        self._built.add(index)
+
+    def _stream(self, bounds, lead):
+        left, bottom, right, top = bounds
+        lead_x, lead_y = lead
+        if lead_x or lead_y:
+            budget = self.PREFETCH_PER_FRAME
+            for index in self._overlapping((left + lead_x, bottom + lead_y, right + lead_x, top + lead_y)):
+                if not budget:
+                    break
+                if index not in self._built:
+                    self._build(index)
+                    budget -= 1
+
+        margin_x, margin_y = (right - left) * self.EVICT_MARGIN, (top - bottom) * self.EVICT_MARGIN
+        keep = self._overlapping((left - margin_x, bottom - margin_y, right + margin_x, top + margin_y))
+        for index in self._built.difference(keep.tolist()):
+            self._chunks[index].delete()
+            self._built.discard(index)
+
+    def delete(self):
+        for chunk in self._chunks:
+            chunk.delete()
+
+    def set_layer(self, layer, mask, color=None):
+        """ Covers the tiles in the boolean mask with color on the given layer, replacing
+            whatever the layer showed before. color is either one (r, g, b) or an array of
+            per-tile colors shaped like the map, and defaults to the layer's usual color.
+        """
+        old_mask, _ = self._layers[layer]
+        mask = np.asarray(mask, dtype=bool)
+        color = self.LAYER_COLORS[layer] if color is None else color
+        self._layers[layer] = (mask, color)
+        if layer == self.CURSOR_LAYER:
+            self._cursor = None
+        self._refresh(old_mask | mask)
 
-    def radius_highlight(self, start_i, start_j, radius, exempt):
-        in_range = self._points_in_range(start_i, start_j, radius)
-        for ij in in_range:
-            if ij not in exempt:
-                self._radius_highlights.append(ij)
-                self._sprites[ij].color = self.RADIUS_HIGHLIGHT_COLOR
+    def clear_layer(self, layer):
+        old_mask, color = self._layers[layer]
+        self._layers[layer] = (np.zeros(self.grid.shape, dtype=bool), color)
+        if layer == self.CURSOR_LAYER:
+            self._cursor = None
+        self._refresh(old_mask)
 
-    def reset_radius_highlight(self):
-        for ij in self._radius_highlights:
-            self._sprites[ij].color = self.NORMAL_COLOR
-        self._radius_highlights = []
+    def in_layer(self, layer, i, j):
+        return self.grid.in_bounds(i, j) and bool(self._layers[layer][0][i, j])
 
-    def is_highlighted(self, i, j):
-        return (i, j) in self._radius_highlights
+    def _refresh(self, changed):
+        " Recomposites the layers over the bounding box of changed "
+        rows, columns = np.nonzero(changed.any(axis=1))[0], np.nonzero(changed.any(axis=0))[0]
+        if rows.size:
+            self._refresh_box(rows[0], rows[-1] + 1, columns[0], columns[-1] + 1)
+
+    def _refresh_box(self, start_i, end_i, start_j, end_j):
+        " Recomposites the layers over tiles [start_i, end_i) by [start_j, end_j) and uploads any affected chunks "
+        box = slice(start_i, end_i), slice(start_j, end_j)
+        composite = np.empty(self._colors[box].shape, dtype=np.uint8)
+        composite[:] = self.NORMAL_COLOR
+        for mask, color in self._layers:
+            covered = mask[box]
+            composite[covered] = color[box][covered] if isinstance(color, np.ndarray) else color
+        self._colors[box] = composite
+
+        size = self.CHUNK_SIZE
+        chunks_deep = -(-self._depth // size)
+        for chunk_i in range(start_i // size, (end_i - 1) // size + 1):
+            for chunk_j in range(start_j // size, (end_j - 1) // size + 1):
+                chunk = self._chunk_lookup[chunk_i * chunks_deep + chunk_j]
+                if chunk.built:
+                    chunk.colors()[:, :, :3] = self._colors[chunk.tiles][:, np.newaxis]
+
+    def highlight(self, i, j):
+        " Moves the cursor to (i, j), returning it if that is on the map "
+        if not self.grid.in_bounds(i, j):
+            return None
+        cursor, _ = self._layers[self.CURSOR_LAYER]
+        if self._cursor is None:
+            # Whatever the layer held last was set as a whole, so clear it the same way
+            self.clear_layer(self.CURSOR_LAYER)
+            cursor, _ = self._layers[self.CURSOR_LAYER]
+        else:
+            cursor[self._cursor] = False
+            self._refresh_box(self._cursor[0], self._cursor[0] + 1, self._cursor[1], self._cursor[1] + 1)
+        cursor[i, j] = True
+        self._cursor = i, j
+        self._refresh_box(i, i + 1, j, j + 1)
+        return i, j
 
     def get_starting_positions(self, team_size):
         """Returns starting positions on this map for a team of size `team_size`.
            Result is pairs of coordinates and a direction, which is the direction towards the center"""
-        starting_x = int((self._width - team_size) / 2)
-        starting_y = int((self._depth - team_size) / 2)
-        return [[(x_side, starting_y + y_offset, direction) for y_offset in range(team_size)] for x_side, direction in ((0, Direction.SOUTH), (self._width - 1, Direction.NORTH))] \
-             + [[(starting_x + x_offset, y_side, direction) for x_offset in range(team_size)] for y_side, direction in ((0, Direction.WEST), (self._depth - 1, Direction.EAST))]
-
-    def find_path(self, start_x, start_y, target_x, target_y):
-        coordinates_raw = {}
-        for ij, xy in self._ij_to_xy.items():
-            arr = coordinates_raw.get(ij[0], [])
-            arr.append(xy)
-            coordinates_raw[ij[0]] = arr
-        coordinates = list(coordinates_raw.values())
-        return find_path(coordinates, start_x ,start_y, target_x, target_y)
+        facing = (Direction.SOUTH, Direction.NORTH, Direction.WEST, Direction.EAST)
+        return [[(i, j, direction) for i, j in positions]
+                for positions, direction in zip(starting_positions(self._width, self._depth, team_size), facing)]
 
     def get_xy(self, i, j):
         " Get the x, y coordinates for the ith column and jth row "
-        return self._ij_to_xy[(i, j)]
+        return self.grid.ij_to_xy(i, j)
 
     def get_row_column(self, x, y):
         " Get the row, column pair for the given x,y "
-        return self._xy_to_ij[(x, y)]
-
-    def get_sprite(self, i, j):
-        " Get the sprite at the ith column and jth row "
-        if 0 <= i < self._width and 0 <= j < self._depth:
-            return self._sprites[(i, j)]
-        return None
+        return self.grid.xy_to_ij(x, y)
 
-    def find_sprite(self, x, y):
-        " Get the sprite which the given x,y falls within "
-        for column in self._sprites:
-            for sprite in column:
-                if sprite.contains(x, y):
-                    return sprite
+    def find_tile(self, x, y):
+        " Get the i, j of the tile whose top face the world x,y falls within, or None if off the map "
+        i, j = self.grid.xy_to_ij(x, y)
+        if self.grid.in_bounds(i, j):
+            return i, j
         return None
-
-    def _points_in_range(self, column, row, length):
-        if not 0 <= column < self._depth:
-            return []
-        if length == 0:
-            return [(column, row)]
-        return self._points_in_range(column - 1, row, length - 1) +\
-                [(column, min(max(0, row - length + i), self._width - 1))
-                    for i in range(2 * length + 1)] + \
-                self._points_in_range(column + 1, row, length - 1)
@@ -0,0 +1,84 @@
+"""
+    On-disk format for maps.
+
+    A map file is a fixed header, then an index holding the byte offset of
+    every chunk, then each chunk's tile records. Chunks are chunk_size square
+    (smaller along the far edges) and are listed i-major, as are the tiles
+    within them. Every tile is one TILE record.
+
+    Files are read through mmap, so a chunk is only paged in from disk when
+    something actually looks at it.
+"""
+import mmap
+import struct
+
+import numpy as np
+
+MAGIC = b"PTMP"
+VERSION = 1
+CHUNK_SIZE = 16
+
+# magic, version, chunk size, width, depth
+HEADER = struct.Struct("<4sHHII")
+TILE = np.dtype([("block", "u1"), ("height", "u1"), ("flags", "u1"), ("cost", "u1")])
+
+
+def _chunk_counts(width, depth, chunk_size):
+    return -(-width // chunk_size), -(-depth // chunk_size)
+
+
+def write_map(path, grid, chunk_size=CHUNK_SIZE):
+    " Saves the terrain of a TileGrid to path "
+    chunks_wide, chunks_deep = _chunk_counts(grid.width, grid.depth, chunk_size)
+    offset = HEADER.size + chunks_wide * chunks_deep * 8
+    offsets, records = [], []
+    for i in range(0, grid.width, chunk_size):
+        for j in range(0, grid.depth, chunk_size):
+            window = slice(i, i + chunk_size), slice(j, j + chunk_size)
+            chunk = np.empty(grid.block[window].shape, dtype=TILE)
+            for field in TILE.names:
+                chunk[field] = getattr(grid, field)[window]
+            offsets.append(offset)
+            records.append(chunk)
+            offset += chunk.nbytes
+    with open(path, "wb") as map_file:
+        map_file.write(HEADER.pack(MAGIC, VERSION, chunk_size, grid.width, grid.depth))
+        map_file.write(np.array(offsets, dtype="<u8").tobytes())
+        for chunk in records:
+            map_file.write(chunk.tobytes())
+
+
+class MapFile:
+    " A map file opened for reading "
+
+    def __init__(self, path):
+        with open(path, "rb") as map_file:
+            self._mmap = mmap.mmap(map_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.chunk_size, self.width, self.depth = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError("%s is not a map file" % path)
+        if version != VERSION:
+            raise ValueError("Unsupported map file version %s" % version)
+        self.chunks_wide, self.chunks_deep = _chunk_counts(self.width, self.depth, self.chunk_size)
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8",
+                                      count=self.chunks_wide * self.chunks_deep, offset=HEADER.size)
+
+    def chunk(self, chunk_i, chunk_j):
+        " The tile records of one chunk, as a read-only (rows, columns) view straight onto the file "
+        rows = min(self.chunk_size, self.width - chunk_i * self.chunk_size)
+        columns = min(self.chunk_size, self.depth - chunk_j * self.chunk_size)
+        offset = int(self._offsets[chunk_i * self.chunks_deep + chunk_j])
+        return np.frombuffer(self._mmap, dtype=TILE, count=rows * columns, offset=offset).reshape(rows, columns)
+
+    def read_into(self, grid, chunk_i, chunk_j):
+        " Decodes one chunk into the matching tiles of grid "
+        records = self.chunk(chunk_i, chunk_j)
+        i, j = chunk_i * self.chunk_size, chunk_j * self.chunk_size
+        window = slice(i, i + records.shape[0]), slice(j, j + records.shape[1])
+        for field in TILE.names:
+            getattr(grid, field)[window] = records[field]
+
+    def close(self):
+        # Views handed out by chunk() keep the mapping alive, so let those go first
+        self._offsets = None
+        self._mmap.close()
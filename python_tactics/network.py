@@ -0,0 +1,299 @@
+"""
+    Lockstep multiplayer over TCP.
+
+    Every player runs the whole battle themselves. Battles are deterministic,
+    random state and all, so only the actions players take need to be sent,
+    a dozen or so bytes each. Each command carries a CRC32 of the battle as
+    it stood after the command was applied. The players it reaches apply it
+    too, compare checksums, and send theirs back, so both sides notice the
+    very turn the two games stop agreeing.
+
+    Players never talk to each other directly. They connect to a relay,
+    which numbers them in the order they arrive, tells everyone once the game
+    is full, and from then on passes whatever one player sends on to all the
+    others. The first player sets the game up and sends the map and starting
+    battle, encoded like a save, to the rest.
+
+    A Connection runs asyncio on a thread of its own, so the game never waits
+    on the network. What arrives is handed over through a queue the game
+    polls once a frame, and what the game sends is handed to the network
+    thread to write straight away.
+
+    Every message is a FRAME, a type byte and a payload length, followed by
+    the payload.
+"""
+import asyncio
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from python_tactics.battle import Action
+from python_tactics.save import decode, encode, encode_terrain
+
+PORT = 47200
+
+WELCOME, START, SETUP, COMMAND, CHECK, LEFT = list(range(6))
+
+FRAME = struct.Struct("<BI")
+# team, player count
+WELCOME_RECORD = struct.Struct("<BB")
+# turn, kind, unit, i, j, checksum of the battle after it
+COMMAND_RECORD = struct.Struct("<IBhhhI")
+# turn, checksum of the battle after it
+CHECK_RECORD = struct.Struct("<II")
+# team
+LEFT_RECORD = struct.Struct("<B")
+
+# What a Connection hands the game
+Welcome = namedtuple("Welcome", "team players")
+Started = namedtuple("Started", "")
+Setup = namedtuple("Setup", "game")
+Command = namedtuple("Command", "turn action checksum")
+Lost = namedtuple("Lost", "reason")
+
+
+def checksum(battle):
+    return zlib.crc32(battle.pack())
+
+
+def message(kind, payload=b""):
+    return FRAME.pack(kind, len(payload)) + payload
+
+
+async def read_message(reader):
+    " The next (type, payload) from reader, raising IncompleteReadError once it closes "
+    kind, length = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return kind, await reader.readexactly(length)
+
+
+class Connection:
+    """ One player's link to the relay. Poll it every frame for what other
+        players have sent, and tell it about every action this player takes.
+    """
+
+    def __init__(self, host="localhost", port=PORT):
+        self.host, self.port = host, port
+        self.team = None
+        self.players = None
+        # Commands sent or played so far
+        self.turn = 0
+        # Seconds between sending the latest confirmed command and every other player confirming it
+        self.latency = None
+        self._inbox = queue.SimpleQueue()
+        self._closed = False
+        # Only touched on the network thread
+        self._writer = None
+        self._unsent = []
+        self._task = None
+        self._closing = False
+        # Turn to (time sent, checksum, confirmations still to come)
+        self._awaiting = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),),
+                                        name="network", daemon=True)
+        self._thread.start()
+
+    def poll(self):
+        " The next thing to have arrived, or None "
+        try:
+            return self._inbox.get_nowait()
+        except queue.Empty:
+            return None
+
+    def send_setup(self, battle):
+        grid = battle.grid
+        self._send(message(SETUP, encode(grid.width, grid.depth, encode_terrain(grid), battle.pack())))
+
+    def send_command(self, action, battle):
+        " Sends action, which this player has just applied to battle "
+        turn, state = self.turn, checksum(battle)
+        self.turn += 1
+        data = message(COMMAND, COMMAND_RECORD.pack(turn, action.kind, action.unit, action.i, action.j, state))
+        if not self._closed:
+            self._loop.call_soon_threadsafe(self._send_command, turn, state, data)
+
+    def play(self, command, battle):
+        """ Applies a command from another player to battle and confirms it,
+            returning the events. Raises ValueError if it is out of turn,
+            illegal, or leaves the battle different from theirs.
+        """
+        if command.turn != self.turn:
+            raise ValueError("Expected turn %d from the other player, got %d" % (self.turn, command.turn))
+        if not battle.is_legal(command.action):
+            raise ValueError("The other player sent an illegal action on turn %d" % command.turn)
+        events = battle.apply(command.action)
+        state = checksum(battle)
+        self.turn += 1
+        self._send(message(CHECK, CHECK_RECORD.pack(command.turn, state)))
+        if state != command.checksum:
+            raise ValueError("Out of sync with the other player on turn %d" % command.turn)
+        return events
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._loop.call_soon_threadsafe(self._stop)
+
+    def _send(self, data):
+        if not self._closed:
+            self._loop.call_soon_threadsafe(self._write, data)
+
+    # Everything below runs on the network thread
+
+    def _write(self, data):
+        if self._writer is None:
+            self._unsent.append(data)
+        else:
+            # Messages are tiny, so there is no waiting for the buffer to drain
+            self._writer.write(data)
+
+    def _send_command(self, turn, state, data):
+        if self.players is not None and self.players > 1:
+            self._awaiting[turn] = time.perf_counter(), state, self.players - 1
+        self._write(data)
+
+    def _confirm(self, turn, state):
+        if turn not in self._awaiting:
+            return
+        sent, expected, remaining = self._awaiting.pop(turn)
+        if state != expected:
+            self._inbox.put(Lost("Out of sync with the other player on turn %d" % turn))
+        elif remaining > 1:
+            self._awaiting[turn] = sent, expected, remaining - 1
+        else:
+            self.latency = time.perf_counter() - sent
+
+    def _stop(self):
+        self._closing = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        self._task = asyncio.current_task()
+        if self._closing:
+            return
+        try:
+            reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            for data in self._unsent:
+                self._writer.write(data)
+            self._unsent = []
+            while True:
+                kind, payload = await read_message(reader)
+                self._receive(kind, payload)
+        except asyncio.CancelledError:
+            pass
+        except (OSError, asyncio.IncompleteReadError) as error:
+            reason = "Lost the connection to the relay"
+            if isinstance(error, OSError) and self._writer is None:
+                reason = "Could not reach a relay at %s:%d" % (self.host, self.port)
+            self._inbox.put(Lost(reason))
+        except (ValueError, struct.error) as error:
+            # A message that does not decode leaves no way to stay in step, so the game is over
+            self._inbox.put(Lost("Received a message this game cannot read: %s" % error))
+        finally:
+            if self._writer is not None:
+                # Let anything still buffered, like a winning command, go out first
+                self._writer.close()
+                try:
+                    await self._writer.wait_closed()
+                except OSError:
+                    pass
+
+    def _receive(self, kind, payload):
+        if kind == WELCOME:
+            self.team, self.players = WELCOME_RECORD.unpack(payload)
+            self._inbox.put(Welcome(self.team, self.players))
+        elif kind == START:
+            self._inbox.put(Started())
+        elif kind == SETUP:
+            self._inbox.put(Setup(decode(payload, "the game sent by the first player")))
+        elif kind == COMMAND:
+            turn, action_kind, unit, i, j, state = COMMAND_RECORD.unpack(payload)
+            self._inbox.put(Command(turn, Action(action_kind, unit, i, j), state))
+        elif kind == CHECK:
+            self._confirm(*CHECK_RECORD.unpack(payload))
+        elif kind == LEFT:
+            team, = LEFT_RECORD.unpack(payload)
+            self._inbox.put(Lost("Player %d left the game" % (team + 1)))
+
+
+class Relay:
+    """ Fills one game at a time with players, numbering them as they
+        connect, and forwards everything each sends on to the rest. Once
+        everyone has gone it starts filling the next game.
+    """
+
+    def __init__(self, players=2):
+        self.players = players
+        # Writers by team, None once that player has gone
+        self.room = []
+        self.started = False
+
+    async def serve(self, reader, writer):
+        if self.started:
+            writer.close()
+            return
+        team = len(self.room)
+        self.room.append(writer)
+        writer.write(message(WELCOME, WELCOME_RECORD.pack(team, self.players)))
+        if len(self.room) == self.players:
+            self.started = True
+            for other in self.room:
+                if other is not None:
+                    other.write(message(START))
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                data = message(kind, payload)
+                for other in self.room:
+                    if other is not None and other is not writer:
+                        other.write(data)
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.room[team] = None
+            writer.close()
+            for other in self.room:
+                if other is not None:
+                    other.write(message(LEFT, LEFT_RECORD.pack(team)))
+            if all(other is None for other in self.room):
+                self.room = []
+                self.started = False
+
+
+async def relay(host, port, players):
+    server = await asyncio.start_server(Relay(players).serve, host, port)
+    print("relay: waiting for %d players on %s:%d" % (players, host, port))
+    async with server:
+        await server.serve_forever()
+
+
+def add_parser(commands):
+    parser = commands.add_parser("relay", help="pass commands between players of network games")
+    parser.add_argument("--host", default="localhost", help="address to listen on, eg 0.0.0.0 for every interface")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--players", type=int, default=2, help="players in each game")
+    parser.set_defaults(run=main)
+
+    parser = commands.add_parser("join", help="play a network game through a relay")
+    parser.add_argument("host", nargs="?", default="localhost", help="where the relay is running")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.set_defaults(run=join)
+
+
+def main(args):
+    try:
+        asyncio.run(relay(args.host, args.port, args.players))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+def join(args):
+    #pylint: disable=import-outside-toplevel
+    from python_tactics.scenes.network import LobbyScene
+    from python_tactics.start import start
+    start(LobbyScene, connection=Connection(args.host, args.port))
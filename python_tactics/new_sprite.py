@@ -30,11 +30,13 @@ from collections import namedtuple
 from enum import Enum
 from functools import reduce
 
-from pyglet import graphics, image, media
+from pyglet import graphics, media
 from pyglet.sprite import Sprite
-from pyglet.text import Label
 
-from python_tactics.util import asset_to_file
+from python_tactics import atlas
+from python_tactics.assets import assets
+from python_tactics.hud import Floater, Readout, glyph_atlas
+from python_tactics.paths import asset_to_file
 
 
 class Direction(Enum):
@@ -44,29 +46,27 @@ class Direction(Enum):
     WEST = 3
 
 def sound_clip(sound_asset):
-    return media.load(asset_to_file(os.path.join("sounds", sound_asset)), streaming=False)
+    " A handle for a sound, decoded into memory the first time it is played "
+    path = asset_to_file(os.path.join("sounds", sound_asset))
+    return assets().handle(("sound", path), lambda: media.load(path, streaming=False),
+                           size=lambda sound: int(sound.duration * sound.audio_format.bytes_per_second))
 
 class Image:
 
-    def __init__(self, image_asset):
-        self._image = image.load(asset_to_file(os.path.join("images", image_asset)))
-        self._image.anchor_x = int(self._image.width / 2)
-        self._image.anchor_y = int(self._image.height)
+    def __init__(self, frame_name, flip_x=False):
+        self.frame_name = frame_name
+        self.flip_x = flip_x
+        self.handle = atlas.handle(frame_name, flip_x)
 
     @property
     def flipped_about_x(self):
-        anchor_x, anchor_y = self._image.anchor_x, self._image.anchor_y
-        width, height = self._image.width, self._image.height
-        self._image = self._image.get_texture().get_transform(flip_x=True)
-        self._image.anchor_x = width - anchor_x
-        self._image.anchor_y = height - anchor_y
-        return self
+        return Image(self.frame_name, not self.flip_x)
 
     def get_texture(self):
-        return self._image.get_texture()
+        return self.handle.get().get_texture()
 
     def blit(self, x, y):
-        self._image.blit(x, y)
+        self.handle.get().blit(x, y)
 
 class Frame(namedtuple("Frame", "image duration")):
 
@@ -102,14 +102,19 @@ class Animation(namedtuple("Animation", "frames amount_played")):
 SpriteBase = namedtuple("SpriteBase", "x y")
 
 class Health:
-    def __init__(self, current_health, max_health, x, y, y_offset):
+    def __init__(self, current_health, max_health, x, y, y_offset, batch=None, group=None):
         self.current_health = current_health
         self.max_health = max_health
         self.y_offset = y_offset
-        self.sprite = self._create_sprite(x, y)
+        # Drawn on its own unless it is given a batch to join
+        self._batch = None
+        if batch is None:
+            batch = self._batch = graphics.Batch()
+        self.sprite = Readout(glyph_atlas(), self._create_label_text(), x, y + (self.y_offset - 20), batch, group)
 
     def draw(self):
-        self.sprite.draw()
+        if self._batch:
+            self._batch.draw()
 
     @property
     def x(self):
@@ -127,6 +132,14 @@ class Health:
     def y(self, y):
         self.sprite.y = y + (self.y_offset - 20)
 
+    @property
+    def visible(self):
+        return self.sprite.visible
+
+    @visible.setter
+    def visible(self, visible):
+        self.sprite.visible = visible
+
     def hit(self, attack):
         self.current_health = max(0, self.current_health - attack)
         self.sprite.text = self._create_label_text()
@@ -135,29 +148,104 @@ class Health:
     def delete(self):
         self.sprite.delete()
 
-    def _create_sprite(self, x, y):
-        return Label(text=self._create_label_text(),
-                     font_name='Times New Roman',
-                     font_size=18,
-                     bold=True,
-                     x=x,
-                     y=y + (self.y_offset - 20),
-                     anchor_x='center')
-
     def _create_label_text(self):
         return f"{self.current_health}/{self.max_health}"
 
 
+class Stage:
+    """ Draws many characters from one Batch, back to front.
+
+        Every screen row a character can stand on gets its own OrderedGroup,
+        rows higher up the screen being further back and drawn first. Sprites
+        sharing a row and a texture are drawn together, and a character only
+        changes group when it crosses into another row, so nothing is sorted
+        per frame. Health labels all share one group drawn over every row.
+        Characters that are off screen or hidden are left out. Damage
+        numbers float up from characters in the label group too.
+    """
+
+    DAMAGE_COLOR = 255, 80, 80, 255
+
+    def __init__(self, row_height):
+        self.batch = graphics.Batch()
+        self.row_height = row_height
+        self.characters = []
+        self._sprite_group = graphics.OrderedGroup(0)
+        self.ui_group = graphics.OrderedGroup(1)
+        # Row to its group. Sprites only share a draw if their groups are the same object.
+        self._rows = {}
+        self._bounds = None
+        self._dirty = True
+        self._floaters = []
+
+    def row(self, y):
+        return -int(y // self.row_height)
+
+    def group(self, row):
+        found = self._rows.get(row)
+        if found is None:
+            found = self._rows[row] = graphics.OrderedGroup(row, self._sprite_group)
+        return found
+
+    def float_text(self, text, x, y, color=DAMAGE_COLOR):
+        " Shows text rising from x, y and fading away "
+        self._floaters.append(Floater(Readout(glyph_atlas(), text, x, y, self.batch, self.ui_group, color=color)))
+
+    def tick(self, time_delta):
+        for floater in self._floaters:
+            floater.tick(time_delta)
+            if floater.done:
+                floater.readout.delete()
+        self._floaters = [floater for floater in self._floaters if not floater.done]
+
+    def invalidate(self):
+        " Has which characters are shown worked out again at the next draw "
+        self._dirty = True
+
+    def draw(self, bounds):
+        " Draws the characters overlapping the world space (left, bottom, right, top) bounds "
+        if self._dirty or bounds != self._bounds:
+            self._cull(bounds)
+            self._bounds, self._dirty = bounds, False
+        self.batch.draw()
+
+    def _cull(self, bounds):
+        left, bottom, right, top = bounds
+        for character in self.characters:
+            sprite = character.sprite
+            # Loose enough to take in the health label above the sprite
+            shown = (not character.hidden
+                     and sprite.x - sprite.width < right and sprite.x + sprite.width > left
+                     and sprite.y - sprite.height < top and sprite.y + 2 * sprite.height > bottom)
+            if sprite.visible != shown:
+                sprite.visible = shown
+                character.health.visible = shown
+
+
 class Character:
 
-    def __init__(self, x, y, facing=Direction.NORTH):
+    def __init__(self, x, y, facing=Direction.NORTH, stage=None):
         self.facing = facing
         self.movement_queue = []
         self.movement_ticks = 0
-        self.sprite = Sprite(self.Sprite.faces[facing], x, y)
-        self.health = Health(self.health, self.health, x, y, self.sprite.height)
+        self.stage = stage
+        self.row = None
+        self._hidden = False
+        if stage:
+            self.row = stage.row(y)
+            self.sprite = Sprite(self.Sprite.faces[facing].get(), x, y, batch=stage.batch, group=stage.group(self.row))
+            self.health = Health(self.health, self.health, x, y, self.sprite.height, stage.batch, stage.ui_group)
+            stage.characters.append(self)
+        else:
+            self.sprite = Sprite(self.Sprite.faces[facing].get(), x, y)
+            self.health = Health(self.health, self.health, x, y, self.sprite.height)
         self.last_stop = (self.x, self.y)
 
+    @classmethod
+    def handles(cls):
+        " Everything the character is drawn and heard with "
+        return [*cls.Sprite.faces.values(), cls.profile.handle, cls.attack_sound]
+
     def draw_character(self):
         self.sprite.draw()
 
@@ -165,9 +253,23 @@ class Character:
         self.health.draw()
 
     def delete(self):
+        if self.stage:
+            self.stage.characters.remove(self)
         self.health.delete()
         self.sprite.delete()
 
+    @property
+    def hidden(self):
+        " Whether the character is left out when its stage draws "
+        return self._hidden
+
+    @hidden.setter
+    def hidden(self, hidden):
+        if hidden != self._hidden:
+            self._hidden = hidden
+            if self.stage:
+                self.stage.invalidate()
+
     @property
     def x(self):
         return self.sprite.x
@@ -176,6 +278,8 @@ class Character:
     def x(self, x):
         self.sprite.x = x
         self.health.x = x
+        if self.stage:
+            self.stage.invalidate()
 
     @property
     def y(self):
@@ -185,6 +289,12 @@ class Character:
     def y(self, y):
         self.sprite.y = y
         self.health.y = y
+        if self.stage:
+            row = self.stage.row(y)
+            if row != self.row:
+                self.row = row
+                self.sprite.group = self.stage.group(row)
+            self.stage.invalidate()
 
     @property
     def color(self):
@@ -196,7 +306,9 @@ class Character:
 
     def look(self, direction):
         self.facing = direction
-        self.sprite.image = self.Sprite.faces[direction]
+        face = self.Sprite.faces[direction].get()
+        if self.sprite.image is not face:
+            self.sprite.image = face
 
     def move_to(self, x, y, duration=1):
         self.movement_queue.append((x, y, duration))
@@ -226,6 +338,8 @@ class Character:
             self.look(self.facing)
 
     def hit(self, attack):
+        if self.stage and not self.hidden:
+            self.stage.float_text("-%d" % attack, self.x, self.y + self.sprite.height)
         return self.health.hit(attack)
 
 
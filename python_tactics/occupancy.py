@@ -0,0 +1,93 @@
+"""
+    Tracks which unit stands where.
+
+    Units are identified by small integer ids handed out by whoever spawns
+    them. The index keeps a dense grid of unit ids and another of teams
+    (the form pathing wants), plus each unit's team and tile and a registry
+    of the living members of every team. All of it is updated in place by
+    spawn, move and kill, so lookups never scan or allocate.
+"""
+import numpy as np
+
+from python_tactics.pathing import EMPTY
+
+
+class Occupancy:
+
+    def __init__(self, shape, team_count):
+        self.units = np.full(shape, EMPTY, dtype=np.int32)
+        self.teams = np.full(shape, EMPTY, dtype=np.int8)
+        # Bumped on every change, for caches such as RangeCache
+        self.version = 0
+        self._team_of = []
+        self._tile_of = []
+        self._members = [[] for _ in range(team_count)]
+        self._enemies = [() for _ in range(team_count)]
+
+    def copy(self):
+        other = Occupancy.__new__(Occupancy)
+        other.units, other.teams = self.units.copy(), self.teams.copy()
+        other.version = self.version
+        other._team_of, other._tile_of = list(self._team_of), list(self._tile_of)
+        other._members = [list(members) for members in self._members]
+        other._enemies = list(self._enemies)
+        return other
+
+    @property
+    def team_count(self):
+        return len(self._members)
+
+    def spawn(self, unit_id, team, i, j):
+        if unit_id >= len(self._tile_of):
+            grow = unit_id + 1 - len(self._tile_of)
+            self._team_of.extend([EMPTY] * grow)
+            self._tile_of.extend([None] * grow)
+        self._team_of[unit_id] = team
+        self._tile_of[unit_id] = (i, j)
+        self._members[team].append(unit_id)
+        self.units[i, j], self.teams[i, j] = unit_id, team
+        self._rebuild_enemies()
+        self.version += 1
+
+    def move(self, unit_id, i, j):
+        old_i, old_j = self._tile_of[unit_id]
+        self.units[old_i, old_j], self.teams[old_i, old_j] = EMPTY, EMPTY
+        self.units[i, j], self.teams[i, j] = unit_id, self._team_of[unit_id]
+        self._tile_of[unit_id] = (i, j)
+        self.version += 1
+
+    def kill(self, unit_id):
+        i, j = self._tile_of[unit_id]
+        self.units[i, j], self.teams[i, j] = EMPTY, EMPTY
+        self._tile_of[unit_id] = None
+        self._members[self._team_of[unit_id]].remove(unit_id)
+        self._rebuild_enemies()
+        self.version += 1
+
+    def at(self, i, j):
+        " The id of the unit on (i, j), or EMPTY "
+        return int(self.units[i, j])
+
+    def tile_of(self, unit_id):
+        " The (i, j) a unit stands on, or None once it has died "
+        return self._tile_of[unit_id]
+
+    def team_of(self, unit_id):
+        return self._team_of[unit_id]
+
+    def alive(self, unit_id):
+        return unit_id < len(self._tile_of) and self._tile_of[unit_id] is not None
+
+    def members(self, team):
+        " Living unit ids on team, in the order they spawned. Do not modify. "
+        return self._members[team]
+
+    def enemies(self, team):
+        " Living unit ids on every other team "
+        return self._enemies[team]
+
+    def _rebuild_enemies(self):
+        # Deaths and spawns are rare next to lookups, so pay for the tuples here
+        for team in range(self.team_count):
+            self._enemies[team] = tuple(unit_id for other, members in enumerate(self._members)
+                                        if other != team for unit_id in members)
@@ -0,0 +1,181 @@
+"""
+    Packs the frames the game draws into atlas pages.
+
+    The source sheets are a few megabytes each and most of what is in them
+    is never drawn. This copies only the frames listed in FRAMES onto as few
+    square, power of two pages as they fit on. It then writes a manifest that
+    names every frame, along with its page, its rect and its anchor. The game
+    loads the pages rather than the sheets and looks frames up by name
+    through python_tactics.atlas, so every unit and tile is drawn from the
+    same texture.
+
+    Rects and anchors are in pixels with the origin at the bottom left of
+    the page, the same as pyglet's. Each frame has its edge pixels repeated
+    in a one pixel border, so filtering never blends in its neighbours.
+
+    This only needs numpy and pyglet's bundled PNG codec, never a window, so
+    it can run anywhere. The game imports it on the way to the main menu but
+    only decodes with it when the asset pack is out of date, so numpy is
+    imported where it is used. Run it again after changing FRAMES or a sheet with
+
+        python -m python_tactics atlas
+"""
+import json
+import os
+from collections import namedtuple
+
+from pyglet.extlibs import png
+
+from python_tactics.paths import asset_to_file
+
+MANIFEST = "manifest.json"
+VERSION = 1
+SMALLEST_PAGE = 256
+LARGEST_PAGE = 2048
+BORDER = 1
+
+# name, the sheet it comes from, (rows, columns) of the grid the sheet is cut into, index in that grid,
+# and a function of the frame's (width, height) giving its (anchor_x, anchor_y)
+Frame = namedtuple("Frame", "name sheet grid index anchor")
+
+
+def _bottom_centre(width, _height):
+    return width // 2, 0
+
+
+def _standing(width, _height):
+    " Units stand with their feet a little above the bottom of their frame "
+    return width // 2, 25
+
+
+def _hanging(width, height):
+    return width // 2, height
+
+
+def _centre(width, height):
+    return width // 2, height // 2
+
+
+def _character(name, sheet):
+    faces = {"north": 43, "east": 41, "south": 45, "west": 46}
+    frames = [Frame("%s/%s" % (name, facing), sheet, (12, 24), index, _standing) for facing, index in faces.items()]
+    frames.append(Frame("%s/face" % name, "%s/face" % name, (1, 1), 0, _hanging))
+    return frames
+
+
+# Every block is kept, since any map may use any of them
+FRAMES = ([Frame("blocks/%d" % index, "blocks", (1, 101), index, _bottom_centre) for index in range(101)]
+          + _character("knight", "spaghetti_atlas")
+          + _character("mage", "unicorn_atlas")
+          + [Frame("moogle", "moogle", (1, 1), 0, _centre)])
+
+
+def read_png(path):
+    " The PNG at path as a (height, width, rgba) array, top row first "
+    import numpy as np # pylint: disable=import-outside-toplevel
+    width, height, rows, _ = png.Reader(filename=path).asRGBA8()
+    return np.vstack([np.asarray(row, dtype=np.uint8) for row in rows]).reshape(height, width, 4)
+
+
+def read_sheet(sheet):
+    return read_png(asset_to_file("images/%s.png" % sheet))
+
+
+def cut(pixels, grid, index):
+    """ Cuts frame index out of pixels the way pyglet's ImageGrid would, counting
+        rows from the bottom and dropping any remainder at the right and top
+    """
+    rows, columns = grid
+    height, width = pixels.shape[0] // rows, pixels.shape[1] // columns
+    row, column = divmod(index, columns)
+    bottom = pixels.shape[0] - row * height
+    return pixels[bottom - height:bottom, column * width:(column + 1) * width]
+
+
+def shelf_pack(sizes, size):
+    """ Places as many of the (width, height) sizes as fit on a size by size page,
+        in order, along shelves as tall as the first thing on them. Returns the
+        (left, top) of each one placed, from the top left.
+    """
+    placed = []
+    left = top = shelf = 0
+    for width, height in sizes:
+        if left + width > size:
+            left, top, shelf = 0, top + shelf, 0
+        if width > size or top + height > size:
+            break
+        placed.append((left, top))
+        left += width
+        shelf = max(shelf, height)
+    return placed
+
+
+def layout(sizes):
+    """ Splits the (width, height) sizes across pages, each the smallest power of two
+        that takes the rest of them or else the largest there is. Returns the
+        (page size, [(index into sizes, left, top)]) of each page.
+    """
+    # Tallest first keeps the shelves tight
+    order = sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], -sizes[index][0], index))
+    pages = []
+    while order:
+        size = SMALLEST_PAGE
+        placed = shelf_pack([sizes[index] for index in order], size)
+        while len(placed) < len(order) and size < LARGEST_PAGE:
+            size *= 2
+            placed = shelf_pack([sizes[index] for index in order], size)
+        if not placed:
+            raise ValueError("%dx%d will not fit on a page" % sizes[order[0]])
+        pages.append((size, [(index, left, top) for index, (left, top) in zip(order, placed)]))
+        order = order[len(placed):]
+    return pages
+
+
+def pack(directory, frames=FRAMES):
+    " Writes the pages and manifest for frames into directory, returning the manifest "
+    import numpy as np # pylint: disable=import-outside-toplevel
+    sheets = {}
+    images = []
+    for frame in frames:
+        if frame.sheet not in sheets:
+            sheets[frame.sheet] = read_sheet(frame.sheet)
+        images.append(cut(sheets[frame.sheet], frame.grid, frame.index))
+    sheets.clear()
+
+    padded = [np.pad(image, ((BORDER, BORDER), (BORDER, BORDER), (0, 0)), mode="edge") for image in images]
+    manifest = {"version": VERSION, "pages": [], "frames": {}}
+    os.makedirs(directory, exist_ok=True)
+    for number, (size, placed) in enumerate(layout([(image.shape[1], image.shape[0]) for image in padded])):
+        page = np.zeros((size, size, 4), dtype=np.uint8)
+        for index, left, top in placed:
+            image, frame = padded[index], frames[index]
+            page[top:top + image.shape[0], left:left + image.shape[1]] = image
+            height, width = images[index].shape[:2]
+            anchor_x, anchor_y = frame.anchor(width, height)
+            manifest["frames"][frame.name] = {
+                "page": number,
+                "x": left + BORDER, "y": size - top - BORDER - height, "width": width, "height": height,
+                "anchor_x": anchor_x, "anchor_y": anchor_y,
+            }
+        name = "page%d.png" % number
+        with open(os.path.join(directory, name), "wb") as output:
+            png.Writer(size, size, greyscale=False, alpha=True, compression=9).write(output, page.reshape(size, -1))
+        manifest["pages"].append(name)
+
+    manifest["frames"] = dict(sorted(manifest["frames"].items()))
+    with open(os.path.join(directory, MANIFEST), "w") as output:
+        json.dump(manifest, output, indent=1)
+        output.write("\n")
+    return manifest
+
+
+def add_parser(commands):
+    parser = commands.add_parser("atlas", help="pack the frames the game draws into atlas pages")
+    parser.add_argument("--output", default=asset_to_file("atlas"), help="directory to write the pages and manifest to")
+    parser.set_defaults(run=main)
+
+
+def main(args):
+    manifest = pack(args.output)
+    print("atlas: packed %d frames onto %d page(s) in %s"
+          % (len(manifest["frames"]), len(manifest["pages"]), args.output))
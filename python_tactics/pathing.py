@@ -0,0 +1,157 @@
+"""
+    Movement over a TileGrid. Works purely in (i, j) space so it can be used
+    by headless code as well as the game scene.
+
+    Occupancy is given as an array shaped like the grid holding the team of
+    the unit standing on each tile, or EMPTY. Units may walk through tiles
+    held by their own team but never stop on them, and may not enter tiles
+    held by any other team.
+"""
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+from python_tactics.grid import WALKABLE
+
+EMPTY = -1
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class MovementRange:
+    """ Result of flooding out from origin. Arrays only cover the window of
+        the grid within speed steps of origin, starting at offset.
+    """
+
+    def __init__(self, origin, offset, reachable, cost, parent):
+        self.origin = origin
+        self.offset = offset
+        self.reachable = reachable
+        self.cost = cost
+        self.parent = parent
+
+    def __contains__(self, ij):
+        local = self._local(*ij)
+        return local is not None and bool(self.reachable[local])
+
+    def __iter__(self):
+        off_i, off_j = self.offset
+        for i, j in zip(*np.nonzero(self.reachable)):
+            yield int(i) + off_i, int(j) + off_j
+
+    def __len__(self):
+        return int(np.count_nonzero(self.reachable))
+
+    def mask(self, shape):
+        " The reachable tiles as a boolean mask over a whole grid of the given shape "
+        full = np.zeros(shape, dtype=bool)
+        off_i, off_j = self.offset
+        height, width = self.reachable.shape
+        full[off_i:off_i + height, off_j:off_j + width] = self.reachable
+        return full
+
+    def path_to(self, i, j):
+        " Steps from origin to (i, j) following parent pointers, excluding origin "
+        if (i, j) not in self:
+            return []
+        off_i, off_j = self.offset
+        columns = self.reachable.shape[1]
+        path = []
+        local = (i - off_i) * columns + (j - off_j)
+        origin = (self.origin[0] - off_i) * columns + (self.origin[1] - off_j)
+        while local != origin:
+            path.append((local // columns + off_i, local % columns + off_j))
+            local = int(self.parent.flat[local])
+        path.reverse()
+        return path
+
+    def _local(self, i, j):
+        local_i, local_j = i - self.offset[0], j - self.offset[1]
+        height, width = self.reachable.shape
+        if 0 <= local_i < height and 0 <= local_j < width:
+            return local_i, local_j
+        return None
+
+
+def movement_range(grid, origin, speed, occupants=None, team=None):
+    """ Dijkstra flood fill from origin over at most speed worth of movement
+        cost. Only the tiles within speed steps of origin are ever touched,
+        as every tile costs at least 1 to enter.
+    """
+    origin_i, origin_j = origin
+    lo_i, hi_i = max(0, origin_i - speed), min(grid.width, origin_i + speed + 1)
+    lo_j, hi_j = max(0, origin_j - speed), min(grid.depth, origin_j + speed + 1)
+    rows, columns = hi_i - lo_i, hi_j - lo_j
+
+    walkable = (grid.flags[lo_i:hi_i, lo_j:hi_j] & WALKABLE) != 0
+    if occupants is None:
+        free, passable = walkable, walkable
+    else:
+        window = occupants[lo_i:hi_i, lo_j:hi_j]
+        free = window == EMPTY
+        passable = walkable & (free | (window == team))
+    # Plain lists are much quicker than numpy scalars for the inner loop
+    step_cost = grid.cost[lo_i:hi_i, lo_j:hi_j].ravel().tolist()
+    passable = passable.ravel().tolist()
+
+    unreached = speed + 1
+    cost = [unreached] * (rows * columns)
+    parent = [-1] * (rows * columns)
+    start = (origin_i - lo_i) * columns + (origin_j - lo_j)
+    cost[start] = 0
+    frontier = [(0, start)]
+    while frontier:
+        spent, current = heapq.heappop(frontier)
+        if spent > cost[current]:
+            continue
+        row, column = divmod(current, columns)
+        for d_row, d_column in NEIGHBOURS:
+            n_row, n_column = row + d_row, column + d_column
+            if not (0 <= n_row < rows and 0 <= n_column < columns):
+                continue
+            neighbour = n_row * columns + n_column
+            if not passable[neighbour]:
+                continue
+            total = spent + step_cost[neighbour]
+            if total < cost[neighbour]:
+                cost[neighbour] = total
+                parent[neighbour] = current
+                heapq.heappush(frontier, (total, neighbour))
+
+    cost = np.array(cost, dtype=np.int32).reshape(rows, columns)
+    reachable = (cost <= speed) & free
+    reachable[origin_i - lo_i, origin_j - lo_j] = False
+    return MovementRange(origin, (lo_i, lo_j), reachable, cost,
+                         np.array(parent, dtype=np.int32).reshape(rows, columns))
+
+
+def distance_mask(shape, origin, radius):
+    " Boolean mask over a grid of shape of the tiles within a manhattan distance of radius from origin "
+    i, j = np.ogrid[:shape[0], :shape[1]]
+    return np.abs(i - origin[0]) + np.abs(j - origin[1]) <= radius
+
+
+class RangeCache:
+    """ Remembers the last few movement ranges computed over a grid. Callers
+        bump the occupancy version whenever a unit moves, dies or spawns, and
+        clear the cache when the terrain changes.
+    """
+
+    def __init__(self, grid, size=32):
+        self.grid = grid
+        self.size = size
+        self._ranges = OrderedDict()
+
+    def get(self, origin, speed, occupants, team, version):
+        key = (origin, speed, team, version)
+        found = self._ranges.get(key)
+        if found is not None:
+            self._ranges.move_to_end(key)
+            return found
+        found = self._ranges[key] = movement_range(self.grid, origin, speed, occupants, team)
+        if len(self._ranges) > self.size:
+            self._ranges.popitem(last=False)
+        return found
+
+    def clear(self):
+        self._ranges.clear()
@@ -0,0 +1,22 @@
+"""
+    Where the game keeps the files it writes, such as replays and saves.
+    Everything goes under PYTHON_TACTICS_HOME, or ~/.python_tactics if that
+    is not set. Also where the files it ships with are.
+"""
+import os
+
+
+def data_path(*parts):
+    " A path under the data directory, creating the directories leading to it "
+    root = os.environ.get("PYTHON_TACTICS_HOME") or os.path.join(os.path.expanduser("~"), ".python_tactics")
+    path = os.path.join(root, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def autosave_path():
+    return data_path("saves", "autosave.ptsv")
+
+
+def asset_to_file(asset_name):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", asset_name)
@@ -0,0 +1,187 @@
+"""
+    Command logs of battles, for replaying them exactly.
+
+    A log starts with a header, then the terrain as one TILE record per tile
+    in i-major order. After that come records, each starting with a tag
+    byte. A command record holds one action. A keyframe record holds the
+    whole battle, packed, as it stood after a given number of commands. The
+    first keyframe is written before any commands, and another is written
+    every keyframe_every commands after that.
+
+    Records are appended and flushed as the battle goes, so a log is
+    readable up to its last whole record even when the game crashed while
+    writing it. Reaching any turn means unpacking the keyframe before it and
+    applying at most keyframe_every commands.
+"""
+import glob
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from python_tactics.battle import Action, Battle
+from python_tactics.grid import TileGrid
+from python_tactics.mapfile import TILE
+from python_tactics.paths import data_path
+
+MAGIC = b"PTRL"
+VERSION = 2
+KEYFRAME_EVERY = 16
+
+# magic, version, seed, width, depth, keyframe_every
+HEADER = struct.Struct("<4sHQHHH")
+COMMAND, KEYFRAME = b"C", b"K"
+# kind, unit, i, j
+COMMAND_RECORD = struct.Struct("<Bhhh")
+# turn, length of the packed battle
+KEYFRAME_RECORD = struct.Struct("<II")
+
+
+class Recorder:
+    " Writes a command log as a battle is played "
+
+    def __init__(self, path, battle, seed=0, keyframe_every=KEYFRAME_EVERY):
+        grid = battle.grid
+        self.keyframe_every = keyframe_every
+        self.turn = 0
+        self._file = open(path, "wb") # pylint: disable=consider-using-with
+        self._file.write(HEADER.pack(MAGIC, VERSION, seed, grid.width, grid.depth, keyframe_every))
+        terrain = np.empty(grid.shape, dtype=TILE)
+        for field in TILE.names:
+            terrain[field] = getattr(grid, field)
+        self._file.write(terrain.tobytes())
+        self._keyframe(battle)
+
+    def record(self, action, battle):
+        " Logs action, which has just been applied to battle "
+        self._file.write(COMMAND + COMMAND_RECORD.pack(action.kind, action.unit, action.i, action.j))
+        self.turn += 1
+        if self.turn % self.keyframe_every == 0:
+            self._keyframe(battle)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def _keyframe(self, battle):
+        packed = battle.pack()
+        self._file.write(KEYFRAME + KEYFRAME_RECORD.pack(self.turn, len(packed)) + packed)
+        self._file.flush()
+
+
+class Replay:
+    " A command log read back "
+
+    def __init__(self, path):
+        with open(path, "rb") as log:
+            data = log.read()
+        magic, version, self.seed, width, depth, self.keyframe_every = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("%s is not a replay" % path)
+        if version != VERSION:
+            raise ValueError("Unsupported replay version %s" % version)
+        self.grid = TileGrid(width, depth, 0, 0, 1, 1)
+        offset = HEADER.size
+        terrain = np.frombuffer(data, dtype=TILE, count=width * depth, offset=offset).reshape(width, depth)
+        for field in TILE.names:
+            getattr(self.grid, field)[:] = terrain[field]
+        offset += terrain.nbytes
+        self.commands = []
+        # Turn to packed battle
+        self._keyframes = {}
+        while offset < len(data):
+            tag = data[offset:offset + 1]
+            offset += 1
+            if tag == COMMAND and offset + COMMAND_RECORD.size <= len(data):
+                self.commands.append(Action(*COMMAND_RECORD.unpack_from(data, offset)))
+                offset += COMMAND_RECORD.size
+            elif tag == KEYFRAME and offset + KEYFRAME_RECORD.size <= len(data):
+                turn, length = KEYFRAME_RECORD.unpack_from(data, offset)
+                offset += KEYFRAME_RECORD.size
+                if offset + length > len(data):
+                    break
+                self._keyframes[turn] = data[offset:offset + length]
+                offset += length
+            else:
+                # A record cut short by a crash
+                break
+        if 0 not in self._keyframes:
+            raise ValueError("%s has no starting keyframe" % path)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def battle_at(self, turn, grid=None):
+        """ The battle as it stood after turn commands, fought over grid if
+            given or else a copy of the logged terrain
+        """
+        turn = max(0, min(turn, len(self.commands)))
+        start = max(keyframe for keyframe in self._keyframes if keyframe <= turn)
+        battle = Battle.unpack(self._keyframes[start], grid or self.grid)
+        self.play(battle, start, turn)
+        return battle
+
+    def play(self, battle, start, end):
+        " Applies commands start to end to battle, returning their events "
+        events = []
+        for action in self.commands[start:end]:
+            events.extend(battle.apply(action))
+        return events
+
+
+def new_replay_path():
+    """ A path in the data directory for a new replay, named for when it
+        started. The file is created here, so no other game, even in another
+        process, is handed the same one.
+    """
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    number = 1
+    while True:
+        path = data_path("replays", "%s.ptrl" % (stamp if number == 1 else "%s-%d" % (stamp, number)))
+        try:
+            open(path, "xb").close() # pylint: disable=consider-using-with
+            return path
+        except FileExistsError:
+            number += 1
+
+
+def latest():
+    " The most recently written replay in the data directory, or None "
+    found = glob.glob(data_path("replays", "*.ptrl"))
+    return max(found, key=os.path.getmtime) if found else None
+
+
+def add_parser(commands):
+    parser = commands.add_parser("replay", help="watch or fast-forward through a recorded battle")
+    parser.add_argument("path", nargs="?", help="replay to play, by default the most recent one")
+    parser.add_argument("-t", "--turn", type=int, help="turn to start from, or with --headless to stop at")
+    parser.add_argument("--speed", type=float, default=1.0, help="turns a second to play at")
+    parser.add_argument("--headless", action="store_true", help="replay without a window, as fast as possible")
+    parser.set_defaults(run=main)
+
+
+def main(args):
+    path = args.path or latest()
+    if path is None:
+        sys.exit("replay: no replays recorded yet")
+    replay = Replay(path)
+    if not args.headless:
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.scenes.replay import ReplayScene
+        from python_tactics.start import start
+        start(ReplayScene, path=path, turn=args.turn or 0, speed=args.speed, replay=replay)
+        return
+    turn = len(replay) if args.turn is None else args.turn
+    started = time.perf_counter()
+    battle = replay.battle_at(turn)
+    elapsed = time.perf_counter() - started
+    print("%s: %d turns recorded, seed %d" % (path, len(replay), replay.seed))
+    print("turn %d reached in %.3fs" % (min(turn, len(replay)), elapsed))
+    for unit, record in enumerate(battle.units):
+        state = "at %d,%d" % battle.position(unit) if battle.alive(unit) else "dead"
+        print("  unit %d team %d %s health %d %s" % (unit, record["team"] + 1, battle.stats(unit).__name__,
+                                                      record["health"], state))
+    if battle.winner is not None:
+        print("player %d won" % (battle.winner + 1))
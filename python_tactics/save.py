@@ -0,0 +1,151 @@
+"""
+    Saved games.
+
+    A save is a header, then the terrain as one TILE record per tile in
+    i-major order, then the battle as packed by Battle.pack. The header
+    holds a CRC32 of everything after it, so a damaged save is refused
+    rather than loaded wrong. Saves are written to a temporary file that
+    then replaces the old save, so a crash part way through leaves the
+    previous save intact.
+
+    Autosaver does the encoding and writing on a background thread. The game
+    only packs the battle, a few kilobytes, and hands the bytes over.
+"""
+import os
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from python_tactics.grid import TileGrid
+from python_tactics.mapfile import TILE
+
+MAGIC = b"PTSV"
+VERSION = 2
+
+# magic, version, width, depth, bitmask of computer teams, crc32 of the rest
+HEADER = struct.Struct("<4sHHHBI")
+
+SavedGame = namedtuple("SavedGame", "terrain packed computer_teams")
+
+
+def encode_terrain(grid):
+    terrain = np.empty(grid.shape, dtype=TILE)
+    for field in TILE.names:
+        terrain[field] = getattr(grid, field)
+    return terrain.tobytes()
+
+
+def encode(width, depth, terrain, packed, computer_teams=()):
+    " A whole save as bytes, given the terrain from encode_terrain and a packed battle "
+    body = terrain + packed
+    mask = sum(1 << team for team in computer_teams)
+    return HEADER.pack(MAGIC, VERSION, width, depth, mask, zlib.crc32(body)) + body
+
+
+def write(path, data):
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as save_file:
+        save_file.write(data)
+        save_file.flush()
+        os.fsync(save_file.fileno())
+    os.replace(temporary, path)
+
+
+def save(path, battle, computer_teams=()):
+    grid = battle.grid
+    write(path, encode(grid.width, grid.depth, encode_terrain(grid), battle.pack(), computer_teams))
+
+
+def load(path):
+    " Reads a save back as a SavedGame "
+    with open(path, "rb") as save_file:
+        return decode(save_file.read(), path)
+
+
+def decode(data, name="save"):
+    " A SavedGame from the bytes encode made, naming it name in any error "
+    if len(data) < HEADER.size:
+        raise ValueError("%s is not a saved game" % name)
+    magic, version, width, depth, mask, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("%s is not a saved game" % name)
+    if version != VERSION:
+        raise ValueError("Unsupported save version %s" % version)
+    body = data[HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise ValueError("%s is damaged" % name)
+    terrain = TileGrid(width, depth, 0, 0, 1, 1)
+    records = np.frombuffer(body, dtype=TILE, count=width * depth).reshape(width, depth)
+    for field in TILE.names:
+        getattr(terrain, field)[:] = records[field]
+    computer_teams = tuple(team for team in range(8) if mask & (1 << team))
+    return SavedGame(terrain, body[records.nbytes:], computer_teams)
+
+
+class Autosaver:
+    """ Writes saves of one battle on a background thread. Only the latest
+        snapshot waiting to be written is kept, so a slow disk never builds
+        up a backlog.
+    """
+
+    # Handed to the thread in place of a snapshot to remove the save instead
+    DISCARD = object()
+
+    def __init__(self, path, grid, computer_teams=()):
+        self.path = path
+        self.written = 0
+        self._width, self._depth = grid.width, grid.depth
+        # The terrain never changes during a battle, so it is only encoded once
+        self._terrain = encode_terrain(grid)
+        self._computer_teams = computer_teams
+        self._pending = None
+        self._closing = False
+        self._wake = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def save(self, battle):
+        " Queues a save of battle as it stands now "
+        self._hand_over(battle.pack())
+
+    def discard(self):
+        " Removes the save, once anything queued before has been written "
+        self._hand_over(Autosaver.DISCARD)
+
+    def flush(self):
+        " Waits until everything queued has been written "
+        with self._wake:
+            self._wake.wait_for(lambda: self._pending is None)
+
+    def close(self):
+        " Stops the thread once anything queued has been written "
+        with self._wake:
+            self._closing = True
+            self._wake.notify_all()
+
+    def _hand_over(self, snapshot):
+        with self._wake:
+            self._pending = snapshot
+            self._wake.notify_all()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                self._wake.wait_for(lambda: self._pending is not None or self._closing)
+                snapshot = self._pending
+                if snapshot is None:
+                    return
+            if snapshot is Autosaver.DISCARD:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                write(self.path, encode(self._width, self._depth, self._terrain, snapshot, self._computer_teams))
+                self.written += 1
+            with self._wake:
+                # Only clear it if nothing newer arrived while writing
+                if self._pending is snapshot:
+                    self._pending = None
+                self._wake.notify_all()
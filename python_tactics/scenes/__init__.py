@@ -1,3 +1,8 @@
+from pyglet import image
+from pyglet.gl import GL_BLEND, GL_COLOR_BUFFER_BIT, glDisable, glPopAttrib, glPushAttrib
+from python_tactics.assets import assets
+
+
 class World:
 
     def __init__(self, window, camera):
@@ -21,7 +26,7 @@ class World:
 class Scene:
 
     WINDOW_EVENTS = ["on_draw", "on_mouse_press", "on_mouse_release",
-                     "on_mouse_drag", "on_key_press"]
+                     "on_mouse_drag", "on_mouse_motion", "on_key_press"]
 
     def __init__(self, world):
         self.world = world
@@ -34,6 +39,19 @@ class Scene:
     def window(self):
         return self.world.window
 
+    def use(self, *handles):
+        """ Loads the assets behind handles, so nothing is decoded part way
+            through the scene, and keeps them loaded for as long as this scene
+            is around, including while a modal scene is shown over it
+        """
+        assets().acquire(self, handles)
+        for handle in handles:
+            handle.get()
+
+    def release(self, *handles):
+        " Lets go of handles this scene used, so they can be unloaded again "
+        assets().release(self, handles)
+
     def enter(self):
         pass
 
@@ -62,3 +80,26 @@ class Scene:
 
     def __del__(self):
         print(("Deleting %s" % self))
+
+
+class ModalScene(Scene):
+    """ A scene shown over the one before it. That scene is drawn once, as it
+        was, into a texture when the modal opens. The modal shows the texture
+        behind itself from then on, rather than drawing the scene every frame.
+    """
+
+    def __init__(self, world, previous):
+        super().__init__(world)
+        # Drawn into the back buffer, which is copied into a texture without leaving the GPU
+        previous.on_draw()
+        self.backdrop = image.get_buffer_manager().get_color_buffer().get_texture()
+
+    def draw_backdrop(self):
+        " Covers the whole window with the frozen frame "
+        self.camera.focus(self.window.width, self.window.height)
+        left, bottom, right, top = self.camera.view_bounds(self.window.width, self.window.height)
+        # Opaque, whatever alpha the frame was drawn with
+        glPushAttrib(GL_COLOR_BUFFER_BIT)
+        glDisable(GL_BLEND)
+        self.backdrop.blit(left, bottom, width=right - left, height=top - bottom)
+        glPopAttrib()
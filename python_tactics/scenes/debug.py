@@ -1,23 +1,22 @@
 import pyglet
-from pyglet.image import ImageGrid
 from pyglet.sprite import Sprite
 from pyglet.text import Label
 from pyglet.window import key
+from python_tactics.atlas import atlas
 from python_tactics.scenes import Scene
-from python_tactics.util import load_sprite_asset
 
 
 class AtlasBrowsingScene(Scene):
-
-    blocks = ImageGrid(load_sprite_asset("blocks"), 1, 101)
-    unicorns = ImageGrid(load_sprite_asset("unicorn_atlas"), 12, 24)
-    spaghettis = ImageGrid(load_sprite_asset("spaghetti_atlas"), 12, 24)
+    " Shows every frame in the atlas, grouped by the first part of their names "
 
     def __init__(self, world):
         super().__init__(world)
-        self.sheets = {"blocks": self.blocks, "unicorns": self.unicorns, "spagettis": self.spaghettis}
+        self.sheets = {}
+        for name in atlas().names():
+            self.sheets.setdefault(name.split("/")[0], []).append(name)
         self.sheet = None
         self.sheet_sprite = None
+        self.shown = None
         self.sheet_index = 0
         self.text = Label("", font_name='Times New Roman', font_size=36, x=200, y=300)
 
@@ -55,9 +54,14 @@ class AtlasBrowsingScene(Scene):
         self.update_sprite_and_text()
 
     def update_sprite_and_text(self):
-        sheet_name = list(self.sheets.keys())[self.sheet]
-        old_sprite = self.sheet_sprite
-        self.sheet_sprite = Sprite(self.get_sheet()[self.sheet_index])
+        frame_name = self.get_sheet()[self.sheet_index]
+        old_sprite, old_shown = self.sheet_sprite, self.shown
+        self.shown = atlas().handle(frame_name)
+        # Used before the old frame is let go, so a page they share is never unloaded in between
+        self.use(self.shown)
+        if old_shown:
+            self.release(old_shown)
+        self.sheet_sprite = Sprite(self.shown.get())
         if old_sprite:
             old_sprite.delete()
-        self.text.text = f"{sheet_name}: {self.sheet_index}"
+        self.text.text = frame_name
@@ -1,16 +1,22 @@
 import random
-from functools import reduce
 
 import pyglet
 from pyglet import clock
-from pyglet.graphics import Batch
-from pyglet.image import SolidColorImagePattern
-from pyglet.sprite import Sprite
 from pyglet.text import Label
-from pyglet.window import key
-from python_tactics.characters import Beefy, Ranged
+from pyglet.window import key, mouse
+from python_tactics.ai import ComputerPlayer
+from python_tactics.battle import (ATTACK, MOVE, WAIT, Action, Attacked, Battle,
+                                   Died, Moved, TurnStarted, Won)
+from python_tactics.characters import CHARACTERS
 from python_tactics.map import RectangularMap
-from python_tactics.scenes import Scene
+from python_tactics.network import Command, Lost
+from python_tactics.new_sprite import Stage
+from python_tactics.paths import autosave_path
+from python_tactics.pathing import EMPTY, distance_mask
+from python_tactics.replay import Recorder, new_replay_path
+from python_tactics.save import Autosaver
+from python_tactics.scenes import ModalScene, Scene
+from python_tactics.ui import Overlay
 
 
 #pylint: disable=too-many-instance-attributes
@@ -24,33 +30,71 @@ class GameScene(Scene):
     MAP_START_X, MAP_START_Y = 400, 570
     MAP_WIDTH = MAP_DEPTH = 10
 
-    # The modes the game scene can be in
-    NOTIFY, SELECT_MODE, ACTION_MODE, MOVE_TARGET_MODE, ATTACK_TARGET_MODE = list(range(5))
+    # Seconds the computer may think for each turn
+    COMPUTER_BUDGET = 1.0
 
-    def __init__(self, world):
+    # The modes the game scene can be in
+    (NOTIFY, SELECT_MODE, ACTION_MODE, MOVE_TARGET_MODE, ATTACK_TARGET_MODE, COMPUTER_MODE,
+     REMOTE_MODE) = list(range(7))
+
+    #pylint: disable=too-many-arguments
+    def __init__(self, world, map_path=None, computer_teams=(), state=None, record=True, autosave=True,
+                 connection=None):
+        """ state, if given, is a TileGrid of terrain and a packed Battle fought
+            over it to carry on from, instead of starting a new battle.
+            connection, if given, is a network Connection, and only its team
+            is played from here.
+        """
         super().__init__(world)
-        self.map        = RectangularMap(GameScene.MAP_WIDTH, GameScene.MAP_DEPTH, GameScene.MAP_START_X, GameScene.MAP_START_Y)
-        self.players    = self._initialize_teams()
-        self.current_turn = 1
+        self.use(*RectangularMap.handles(), *(handle for cls in CHARACTERS for handle in cls.handles()))
+        if state:
+            terrain, packed = state
+            self.map    = RectangularMap.from_terrain(terrain, GameScene.MAP_START_X, GameScene.MAP_START_Y)
+        elif map_path:
+            self.map    = RectangularMap.load(map_path, GameScene.MAP_START_X, GameScene.MAP_START_Y)
+        else:
+            self.map    = RectangularMap(GameScene.MAP_WIDTH, GameScene.MAP_DEPTH, GameScene.MAP_START_X, GameScene.MAP_START_Y)
+        # The battle owns the rules, the scene just draws it and feeds it actions
+        if state:
+            self.battle = Battle.unpack(packed, self.map.grid)
+        else:
+            seed = random.getrandbits(64)
+            self.battle = Battle(self.map.grid, GameScene.TEAM_COUNT, random.Random(seed))
+            self._initialize_teams()
+        self.connection = connection
+        if connection and not state:
+            connection.send_setup(self.battle)
+        self.recorder   = None
+        if record:
+            self.recorder = Recorder(new_replay_path(), self.battle, 0 if state else seed)
+        self.computer_teams = computer_teams
+        self.computer   = ComputerPlayer(GameScene.COMPUTER_BUDGET) if computer_teams else None
+        self.autosaver  = None
+        if autosave:
+            self.autosaver = Autosaver(autosave_path(), self.map.grid, computer_teams)
+            self.autosaver.save(self.battle)
+        # Characters indexed by unit id (None once dead), and the living ones in the order they are drawn
+        self.characters = []
+        self.roster     = []
+        self.stage      = Stage(self.map.grid.y_offset)
+        self._create_characters()
         self.selected   = 0, 0
         self.selected_character = None
         self.mode = GameScene.SELECT_MODE
         self.turn_notice = None
-
-        # Items for action menu
-        self.text_batch = Batch()
-        self.cursor_pos = 0
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=self.camera.to_x_from_left(10),
-                            y=self.camera.to_y_from_bottom(140),
-                            batch=self.text_batch)
-        self.action_menu_texts = []
-
-        self.action_menu_items = {
-                "Move"              : self._initiate_movement,
-                "Attack"            : self._initiate_attack,
+        # Forecasts of the selected character's attacks, by the tile of each target
+        self.forecasts  = {}
+        self.forecast_label = Label("", font_name='Times New Roman', font_size=24)
+
+        # The action menu, built once and only drawn while it is open
+        self.overlay = Overlay(self.camera)
+        self.overlay.panel(0, 0, self.window.width, 250, (0, 0, 150, 200))
+        self.action_menu = self.overlay.menu({
                 "Cancel"            : self._close_action_menu,
-        }
+                "Wait"              : self._execute_wait,
+                "Attack"            : self._initiate_attack,
+                "Move"              : self._initiate_movement,
+        }, 40, 200, 50, indent=30)
 
         self.key_handlers = {
             GameScene.SELECT_MODE : {
@@ -59,14 +103,14 @@ class GameScene(Scene):
                 (key.RIGHT, 0)  : lambda: self.move_hilight(1, 0),
                 (key.UP, 0)     : lambda: self.move_hilight(0, -1),
                 (key.DOWN, 0)   : lambda: self.move_hilight(0, 1),
-                (key.TAB, 0)    : self.highlight_next_character_on_current_team,
+                (key.TAB, 0)    : self.highlight_active_character,
                 (key.ENTER, 0)  : self._open_action_menu,
                 },
             GameScene.ACTION_MODE : {
                 (key.ESCAPE, 0)  : self._close_action_menu,
-                (key.UP, 0)     : lambda: self._move_cursor(1),
-                (key.DOWN, 0)   : lambda: self._move_cursor(-1),
-                (key.ENTER, 0)  : self._menu_action
+                (key.UP, 0)     : lambda: self.action_menu.move(-1),
+                (key.DOWN, 0)   : lambda: self.action_menu.move(1),
+                (key.ENTER, 0)  : self.action_menu.choose
                 },
             GameScene.MOVE_TARGET_MODE : {
                 (key.LEFT, 0)   : lambda: self.move_hilight(-1, 0),
@@ -84,27 +128,48 @@ class GameScene(Scene):
                 (key.ENTER, 0)  : self._execute_attack,
                 (key.ESCAPE, 0) : self._open_action_menu,
                 },
+            GameScene.COMPUTER_MODE : {
+                (key.ESCAPE, 0) : self.game_menu,
+                },
+            GameScene.REMOTE_MODE : {
+                (key.ESCAPE, 0) : self.game_menu,
+                },
+        }
+        self.mouse_handlers = {
+            GameScene.SELECT_MODE        : self._open_action_menu,
+            GameScene.MOVE_TARGET_MODE   : self._execute_move,
+            GameScene.ATTACK_TARGET_MODE : self._execute_attack,
         }
-        self.change_player()
+        self.start_turn()
         self.map.highlight(*self.selected)
         self.camera.focus(self.window.width, self.window.height)
 
-    def _all_characters(self):
-        return reduce(lambda chars, player: player + chars, self.players)
-
-    def _other_characters(self):
-        if self.current_turn:
-            return self.players[0]
-        return self.players[1]
-
-    def change_player(self):
-        old_turn = self.current_turn
-        self.current_turn = (self.current_turn + 1) % GameScene.TEAM_COUNT
-        if not self.players[self.current_turn]:
-            self.world.transition(VictoryScene, winner=old_turn + 1)
+    @property
+    def current_turn(self):
+        return self.battle.turn
+
+    @property
+    def viewing_team(self):
+        " The team whose view of the battle is shown, which is never the computer's or another player's "
+        if self.connection:
+            return self.connection.team
+        if self.current_turn not in self.computer_teams:
+            return self.current_turn
+        humans = [team for team in range(GameScene.TEAM_COUNT) if team not in self.computer_teams]
+        return humans[0] if humans else self.current_turn
+
+    def start_turn(self):
+        self.display_turn_notice()
+        self.map.set_layer(RectangularMap.FOG_LAYER, ~self.battle.vision.visible(self.viewing_team))
+        self._hide_unseen()
+        if self.current_turn in self.computer_teams:
+            self.mode = GameScene.COMPUTER_MODE
+            self.computer.start(self.battle)
+        elif self.connection and self.current_turn != self.connection.team:
+            self.mode = GameScene.REMOTE_MODE
         else:
-            self.display_turn_notice()
-            self.highlight_next_character_on_current_team()
+            self.mode = GameScene.SELECT_MODE
+            self.highlight_active_character()
 
     def display_turn_notice(self):
         if self.turn_notice is not None:
@@ -116,34 +181,37 @@ class GameScene(Scene):
                 y=self.camera.to_y_from_bottom(10))
         self.turn_notice.color = 255 - (100 * self.current_turn), 255 - (100 * ((self.current_turn + 1) % 2)), 255, 255
 
-    def highlight_next_character_on_current_team(self):
-        current_team_positions = [self.map.get_row_column(c.x, c.y) for c in self.players[self.current_turn]]
-        if self.selected in current_team_positions:
-            if len(current_team_positions) == 1:
-                return
-            currently_highlighted = current_team_positions.index(self.selected)
-            highlighted_position = current_team_positions[(currently_highlighted + 1) % len(current_team_positions)]
-        else:
-            highlighted_position = current_team_positions[0]
-        self.selected = highlighted_position
+    def highlight_active_character(self):
+        " Moves the cursor onto the character whose turn it is "
+        self.selected = self.battle.position(self.battle.active)
         self.map.highlight(*self.selected)
         newx, newy = self.map.get_xy(*self.selected)
         self.camera.look_at((newx + self.camera.x) / 2, (newy + self.camera.y) / 2)
 
     def _initialize_teams(self):
-        def create_team(team_number, positions):
-            team = []
-            for character_count, (i, j, direction) in enumerate(positions):
-                cls = Beefy if character_count % 2 == 0 else Ranged
-                char_x, char_y = self.map.get_xy(i, j)
-                character = cls(char_x, char_y, direction)
-                character.zindex = 10
-                character.color = 255 - (200 * team_number), 110, 255 - (200 * ((team_number + 1) % GameScene.TEAM_COUNT))
-                team.append(character)
-            return team
-        return [create_team(team_number, positions)
-                for team_number, positions
-                in enumerate(self.map.get_starting_positions(GameScene.TEAM_SIZE)[0:GameScene.TEAM_COUNT])]
+        starting_positions = self.map.get_starting_positions(GameScene.TEAM_SIZE)[0:GameScene.TEAM_COUNT]
+        for team_number, positions in enumerate(starting_positions):
+            for character_count, (i, j, _) in enumerate(positions):
+                self.battle.spawn(CHARACTERS[character_count % len(CHARACTERS)].kind, team_number, i, j)
+
+    def _create_characters(self):
+        # Everyone starts out facing the centre from their own team's edge
+        facing = [positions[0][2] for positions in self.map.get_starting_positions(1)]
+        for unit_id, record in enumerate(self.battle.units):
+            if not self.battle.alive(unit_id):
+                self.characters.append(None)
+                continue
+            team_number = int(record["team"])
+            cls = CHARACTERS[record["kind"]]
+            character = cls(*self.map.get_xy(int(record["i"]), int(record["j"])), facing[team_number], self.stage)
+            character.unit_id = unit_id
+            character.team = team_number
+            character.zindex = 10
+            character.color = 255 - (200 * team_number), 110, 255 - (200 * ((team_number + 1) % GameScene.TEAM_COUNT))
+            if record["health"] < cls.health:
+                character.health.hit(cls.health - int(record["health"]))
+            self.characters.append(character)
+            self.roster.append(character)
 
     def move_hilight(self, delta_i, delta_j):
         current_i, current_j = self.selected
@@ -163,152 +231,180 @@ class GameScene(Scene):
 
     def on_draw(self):
         self.window.clear()
-        self.map.draw()
+        self.camera.focus(self.window.width, self.window.height)
+        bounds = self.camera.view_bounds(self.window.width, self.window.height)
+        self.map.draw(bounds, self.camera.heading)
         if hasattr(self, 'turn_notice'):
             self.turn_notice.x = self.camera.to_x_from_left(10)
             self.turn_notice.y = self.camera.to_y_from_bottom(10)
             self.turn_notice.draw()
-        characters_in_y_order = sorted(self._all_characters(), key=lambda c: -int(c.y))
-        for character in characters_in_y_order:
-#            if (selected_x, selected_y) == (character.x, character.y):
-#                character.color = 100, 100, 100
-#            else:
-#                character.color = 255, 255, 255
-            character.draw_character()
-#            #character.image.blit(character.x, character.y)
-        for character in characters_in_y_order:
-            character.draw_ui()
+        self.stage.draw(bounds)
         if self.mode == GameScene.ACTION_MODE:
-            self._draw_action_menu()
-            self.text_batch.draw()
-        self.camera.focus(self.window.width, self.window.height)
+            self.overlay.draw()
+        if self.mode == GameScene.ATTACK_TARGET_MODE and self.selected in self.forecasts:
+            self._draw_forecast(self.forecasts[self.selected])
         self.camera.draw()
 
-    def _menu_action(self):
-        actions = list(reversed(list(self.action_menu_items.values())))
-        actions[self.cursor_pos]()
-
-    def _move_cursor(self, direction):
-        self.cursor_pos = (self.cursor_pos - direction) % len(self.action_menu_items)
-        self.cursor.y = self.camera.to_y_from_bottom(150 - 50 * self.cursor_pos)
-
-    def _draw_action_menu(self):
-        pattern = SolidColorImagePattern((0, 0, 150, 200))
-        overlay_image = pattern.create_image(1000, 200)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = overlay_image.height + 100
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
-        self._generate_text()
-
-    def _generate_text(self):
-        menu_texts = reversed(list(self.action_menu_items.keys()))
-        for label in self.action_menu_texts:
-            label.delete()
-
-        for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(40, 150 - 50 * i)
-            self.action_menu_texts.append(
-                    Label(text, font_name='Times New Roman', font_size=36,
-                        x=text_x, y=text_y, batch=self.text_batch))
-
-
-#    def on_mouse_press(self, x, y, button, modifiers):
-#        real_x, real_y = int(self.camera.offset_x + x),\
-#                         int(self.camera.offset_y + y)
-#        inside_map = self.map.find_sprite(x, y)
-#        inside_chars = [c for c in self.characters if c.contains(real_x, real_y)]
-#        taken  = [self.map.get_row_column(c.x, c.y) for c in self.characters]
-#
-#        # Reset everything
-#        if self.selected: self.selected.color = 255, 255, 255
-#        for msprite in self.map.sprites:
-#            msprite.color = 255, 255, 255
-#
-#        if inside_chars or inside_map:
-#            if inside_chars:
-#                selected = inside_chars[0]
-#            else:
-#                selected = inside_map
-#            last, self.selected = self.selected, selected
-#            self.selected.color = 100, 100, 100
-#            rx = self.selected.x + self.camera.offset_x
-#            ry = self.selected.y + self.camera.offset_y
-#            column, row = self.map.get_row_column(selected.x, selected.y)
-#            if hasattr(self.selected, "is_player"):
-#                in_range = self._points_in_range(column, row, 4)
-#                for column, row in in_range:
-#                    if (column, row) not in taken:
-#                        self.map.get_sprite(column, row).color = 100, 100, 255
-#            elif hasattr(last, "is_player"):
-#                last_column, last_row = self.map.get_row_column(last.x, last.y)
-#                last_pair = last_column, last_row
-#                new_indexes = self.map.get_row_column(selected.x, selected.y)
-#                new_pair  = int(selected.x), int(selected.y)
-#                in_range = self._points_in_range(last_column, last_row, 4)
-#                if new_indexes in in_range and new_pair not in taken:
-#                    self._schedule_movement(last, new_pair)
-#        else:
-#            self.selected = None
+    def _hide_unseen(self):
+        for character in self.roster:
+            character.hidden = self._hidden(character)
+
+    def _hidden(self, character):
+        " Whether character is an enemy the current team cannot see "
+        if character.team == self.viewing_team:
+            return False
+        return not self.battle.vision.team_sees(self.viewing_team, *self.battle.position(character.unit_id))
+
+    def on_mouse_motion(self, x, y, _dx, _dy):
+        if self.mode not in self.mouse_handlers:
+            return
+        picked = self._pick_tile(x, y)
+        if picked and picked != self.selected:
+            self.selected = self.map.highlight(*picked)
+
+    def on_mouse_press(self, x, y, button, _modifiers):
+        if button != mouse.LEFT or self.mode not in self.mouse_handlers:
+            return
+        picked = self._pick_tile(x, y)
+        if picked:
+            self.selected = self.map.highlight(*picked)
+            self.mouse_handlers[self.mode]()
+
+    def _pick_tile(self, x, y):
+        world_x, world_y = self.camera.window_to_world(x, y, self.window.width, self.window.height)
+        return self.map.find_tile(world_x, world_y)
 
     def _initiate_movement(self):
         self.mode = GameScene.MOVE_TARGET_MODE
-        character = self.selected_character
-        taken  = [self.map.get_row_column(c.x, c.y) for c in self._all_characters()]
-        column, row = self.map.get_row_column(character.x, character.y)
-        self.map.radius_highlight(column, row, character.speed, taken)
+        reachable = self.battle.movement(self.selected_character.unit_id)
+        self.map.set_layer(RectangularMap.MOVE_LAYER, reachable.mask(self.map.grid.shape))
 
     def _execute_move(self):
-        if self.map.is_highlighted(*self.selected):
-            last = self.map.get_xy(*self.selected)
-            self._schedule_movement(self.selected_character, last)
-            self.map.reset_radius_highlight()
-            self.change_player()
+        move = Action(MOVE, self.selected_character.unit_id, *self.selected)
+        if self.battle.is_legal(move):
+            self.map.clear_layer(RectangularMap.MOVE_LAYER)
             self._close_action_menu()
+            self._perform(move)
 
     def _initiate_attack(self):
         self.mode = GameScene.ATTACK_TARGET_MODE
         character = self.selected_character
-        column, row = self.map.get_row_column(character.x, character.y)
-        self.map.radius_highlight(column, row, character.range, [self.selected])
+        origin = self.battle.position(character.unit_id)
+        in_range = distance_mask(self.map.grid.shape, origin, character.range)
+        in_range &= self.battle.vision.unit_field(character.unit_id)
+        in_range[origin] = False
+        self.map.set_layer(RectangularMap.ATTACK_LAYER, in_range)
+        self.forecasts = {self.battle.position(target): outcome
+                          for target, outcome in self.battle.forecasts(character.unit_id).items()}
+
+    def _draw_forecast(self, outcome):
+        if outcome.least == outcome.most:
+            damage = "Hit for %d" % outcome.least
+        else:
+            damage = "Hit for %d-%d (%.1f)" % (outcome.least, outcome.most, outcome.expected)
+        text = "%s, %d%% to defeat" % (damage, round(100 * outcome.kill))
+        if self.forecast_label.text != text:
+            self.forecast_label.text = text
+        self.forecast_label.x, self.forecast_label.y = self.camera.to_xy_from_bottom_left(10, 60)
+        self.forecast_label.draw()
 
     def _execute_attack(self):
-        attacker = self.selected_character
-        attacked = None
-        if self.map.is_highlighted(*self.selected):
-            for character in self._other_characters():
-                char_loc = self.map.get_row_column(character.x, character.y)
-                if  char_loc == self.selected:
-                    attacked = character
-        if attacked:
-            attack = random.randrange(attacker.strength)
-            defense = random.randrange(attacked.defense)
-            hit = max(1, defense - attack)
-            print("Hit for ", hit)
-            attacker.attack_sound.play()
-            remaining_health = attacked.hit(hit)
-            if remaining_health == 0:
-                self._other_characters().remove(attacked)
-                attacked.delete()
-            self.map.reset_radius_highlight()
-            self.change_player()
+        attack = Action(ATTACK, self.selected_character.unit_id, *self.selected)
+        if self.battle.is_legal(attack):
+            self.map.clear_layer(RectangularMap.ATTACK_LAYER)
             self._close_action_menu()
+            self._perform(attack)
+
+    def _execute_wait(self):
+        " Passes the turn on, which is only allowed when there is nothing else to do "
+        wait = Action(WAIT, self.selected_character.unit_id, EMPTY, EMPTY)
+        if self.battle.is_legal(wait):
+            self._close_action_menu()
+            self._perform(wait)
+
+    def _perform(self, action):
+        " Applies a legal action taken here to the battle, and sends it to any other players "
+        events = self.battle.apply(action)
+        if self.connection:
+            self.connection.send_command(action, self.battle)
+        self._performed(action, events)
+
+    def _performed(self, action, events):
+        " Logs an action the battle has just applied and shows what happened "
+        if self.recorder:
+            self.recorder.record(action, self.battle)
+        if self.autosaver:
+            self.autosaver.save(self.battle)
+        self._play(events)
+
+    def _play(self, events):
+        " Shows the results of an action the battle has just applied "
+        for event in events:
+            if isinstance(event, Moved):
+                character = self.characters[event.unit]
+                for i, j in event.path:
+                    character.move_to(*self.map.get_xy(i, j), 0.3)
+            elif isinstance(event, Attacked):
+                self.characters[event.unit].attack_sound.get().play()
+                self.characters[event.target].hit(event.damage)
+            elif isinstance(event, Died):
+                attacked = self.characters[event.unit]
+                self.characters[event.unit] = None
+                self.roster.remove(attacked)
+                attacked.delete()
+            elif isinstance(event, TurnStarted):
+                self.start_turn()
+            elif isinstance(event, Won):
+                if self.autosaver:
+                    self.autosaver.discard()
+                self.close()
+                self.world.transition(VictoryScene, winner=event.team + 1, previous=self)
+        self._hide_unseen()
 
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
         handler = self.key_handlers[self.mode].get(pressed, lambda: None)
         handler()
 
-    def _schedule_movement(self, sprite, pos):
-        end_x, end_y = pos
-        path = self.map.find_path(sprite.x, sprite.y, end_x, end_y)
-        for x, y in path:
-            sprite.move_to(x, y, 0.3)
-
     def _update_characters(self, delta):
-        for character in self._all_characters():
+        for character in self.roster:
             character.tick(delta)
+        self.stage.tick(delta)
+        if self.mode == GameScene.COMPUTER_MODE:
+            self._poll_computer()
+        if self.connection:
+            self._poll_connection()
+
+    def _poll_computer(self):
+        action = self.computer.poll(self.battle)
+        if action is not None:
+            self._perform(action)
+
+    def _poll_connection(self):
+        " Plays whatever other players have sent, and leaves the game if anything went wrong "
+        received = self.connection.poll()
+        while received is not None:
+            if isinstance(received, Command):
+                try:
+                    events = self.connection.play(received, self.battle)
+                except ValueError as error:
+                    self._disconnected(str(error))
+                    return
+                self._performed(received.action, events)
+                if self.connection is None:
+                    # The game was won
+                    return
+            elif isinstance(received, Lost):
+                self._disconnected(received.reason)
+                return
+            received = self.connection.poll()
+
+    def _disconnected(self, reason):
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.scenes.network import LobbyScene
+        connection = self.connection
+        self.close()
+        self.world.transition(LobbyScene, connection=connection, message=reason)
 
     def _close_action_menu(self):
         self.selected_character = None
@@ -316,171 +412,104 @@ class GameScene(Scene):
 
     def _open_action_menu(self):
         if not self.selected_character:
-            selected_x, selected_y = self.map.get_xy(*self.selected)
-            for character in self.players[self.current_turn]:
-                if (character.x, character.y) == (selected_x, selected_y):
-                    self.selected_character = character
+            under_cursor = self.battle.occupancy.at(*self.selected)
+            if under_cursor != EMPTY and under_cursor == self.battle.active:
+                self.selected_character = self.characters[under_cursor]
         if self.selected_character:
-            self.map.reset_radius_highlight()
+            self.map.clear_layer(RectangularMap.MOVE_LAYER)
+            self.map.clear_layer(RectangularMap.ATTACK_LAYER)
             self.camera.stop()
-            self.cursor_pos = 0
-            self.cursor.x = self.camera.to_x_from_left(10)
-            self.cursor.y = self.camera.to_y_from_bottom(150)
+            self.action_menu.select(0)
             self.mode = GameScene.ACTION_MODE
-            self.selected = self.map.get_row_column(self.selected_character.x, self.selected_character.y)
+            self.selected = self.battle.position(self.selected_character.unit_id)
             self.map.highlight(*self.selected)
 
+    def close(self):
+        " Lets go of everything working in the background, for when the game is over or abandoned "
+        if self.computer:
+            self.computer.stop()
+        if self.recorder:
+            self.recorder.close()
+        if self.autosaver:
+            self.autosaver.close()
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
     def game_menu(self):
         self.camera.stop()
         self.world.transition(InGameMenuScene, previous=self)
 
 
-class VictoryScene(Scene):
+class VictoryScene(ModalScene):
 
-    def __init__(self, world, winner):
-        super().__init__(world)
+    def __init__(self, world, winner, previous):
+        super().__init__(world, previous)
         self.winner = winner
-        self.text_batch = Batch()
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=280 + self.camera.offset_x,
-                            y=200 + self.camera.offset_y,
-                            batch=self.text_batch)
-        self.cursor_pos = 0
-
-        self.menu_items = {
+        self.overlay = Overlay(self.camera)
+        # Tints the finished battle
+        self.overlay.panel(0, 0, self.window.width, self.window.height, (0, 0, 100, 200))
+        self.menu = self.overlay.menu({
             "Main Menu" : self._main_menu
-        }
-        self._generate_text()
+        }, 300, 200, 40, indent=20)
+        self.overlay.label("Use Up and Down Arrows to navigate", 400, 30)
+        self.overlay.label("Use Enter to choose", 400, 10)
+        self.overlay.label("Player %s Won!" % self.winner, 250, 400, font_size=48)
 
         self.key_handlers = {
-            (key.UP, 0)     : lambda: self._move_cursor(1),
-            (key.DOWN, 0)   : lambda: self._move_cursor(-1),
-            (key.ENTER, 0)  : self._menu_action
+            (key.UP, 0)     : lambda: self.menu.move(-1),
+            (key.DOWN, 0)   : lambda: self.menu.move(1),
+            (key.ENTER, 0)  : self.menu.choose
         }
 
     def on_draw(self):
-        self.window.clear()
-        # Display the previous scene, then tint it
-        self.text_batch.draw()
+        self.draw_backdrop()
+        self.overlay.draw()
 
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
         handler = self.key_handlers.get(pressed, lambda: None)
         handler()
 
-    def _draw_overlay(self):
-        pattern = SolidColorImagePattern((0, 0, 100, 200))
-        overlay_image = pattern.create_image(1000, 1000)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = int(overlay_image.height / 2)
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
-    def _generate_text(self):
-        menu_texts = reversed(list(self.menu_items.keys()))
-        for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(300, 200 - 40 * i)
-            Label(text, font_name='Times New Roman', font_size=36,
-                    x=text_x, y=text_y, batch=self.text_batch)
-
-        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
-        Label("Use Up and Down Arrows to navigate",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y, batch=self.text_batch)
-        Label("Use Enter to choose",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y - 20, batch=self.text_batch)
-        Label("Player %s Won!" % self.winner,
-                font_name='Times New Roman', font_size=48,
-                x=hint_x - 150, y=hint_y + 370, batch=self.text_batch)
-
-    def _menu_action(self):
-        actions = list(reversed(list(self.menu_items.values())))
-        actions[self.cursor_pos]()
-
-    def _move_cursor(self, direction):
-        self.cursor_pos = (self.cursor_pos - direction) % len(self.menu_items)
-        self.cursor.y = 500 + self.camera.offset_y - 40 * self.cursor_pos
-
     def _main_menu(self):
         #pylint: disable=import-outside-toplevel
         from python_tactics.scenes.preamble import MainMenuScene
         self.world.transition(MainMenuScene)
 
 
-class InGameMenuScene(Scene):
+class InGameMenuScene(ModalScene):
 
     def __init__(self, world, previous):
-        super().__init__(world)
-        self.text_batch = Batch()
+        super().__init__(world, previous)
         self.old_scene = previous
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=self.camera.to_x_from_left(360),
-                            y=self.camera.to_y_from_bottom(500),
-                            batch=self.text_batch)
-        self.cursor_pos = 0
-
-        self.menu_items = {
-            "Resume"            : self._resume_game,
+        self.overlay = Overlay(self.camera)
+        # Tints the paused game
+        self.overlay.panel(0, 0, self.window.width, self.window.height, (0, 0, 0, 200))
+        self.menu = self.overlay.menu({
+            "Quit Current Game" : self._quit_game,
             "Help"              : self._launch_help,
-            "Quit Current Game" : self._quit_game
-        }
-        self._generate_text()
+            "Resume"            : self._resume_game,
+        }, 400, 500, 40)
+        self.overlay.label("Paused", 10, 10, font_size=56)
+        self.overlay.label("Use Up and Down Arrows to navigate", 400, 30)
+        self.overlay.label("Use Enter to choose", 400, 10)
 
         self.key_handlers = {
             (key.ESCAPE, 0) : self._resume_game,
-            (key.UP, 0)     : lambda: self._move_cursor(1),
-            (key.DOWN, 0)   : lambda: self._move_cursor(-1),
-            (key.ENTER, 0)  : self._menu_action
+            (key.UP, 0)     : lambda: self.menu.move(-1),
+            (key.DOWN, 0)   : lambda: self.menu.move(1),
+            (key.ENTER, 0)  : self.menu.choose
         }
 
     def on_draw(self):
-        self.window.clear()
-        # Display the previous scene, then tint it
-        self.old_scene.on_draw()
-        self._draw_overlay()
-        self.text_batch.draw()
+        self.draw_backdrop()
+        self.overlay.draw()
 
     def on_key_press(self, button, modifiers):
         pressed = (button, modifiers)
         handler = self.key_handlers.get(pressed, lambda: None)
         handler()
 
-    def _draw_overlay(self):
-        pattern = SolidColorImagePattern((0, 0, 0, 200))
-        overlay_image = pattern.create_image(self.world.window.width + 200, self.world.window.height + 200)
-        overlay_image.anchor_x = int(overlay_image.width / 2)
-        overlay_image.anchor_y = int(overlay_image.height / 2)
-        overlay = Sprite(overlay_image, self.camera.x, self.camera.y)
-        overlay.draw()
-
-    def _generate_text(self):
-        pause_x, pause_y = self.camera.to_xy_from_bottom_left(10, 10)
-        Label('Paused', font_name='Times New Roman', font_size=56,
-                x=pause_x, y=pause_y, batch=self.text_batch)
-
-        menu_texts = reversed(list(self.menu_items.keys()))
-        for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(400, 500 - 40 * i)
-            Label(text, font_name='Times New Roman', font_size=36,
-                    x=text_x, y=text_y, batch=self.text_batch)
-
-        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
-        Label("Use Up and Down Arrows to navigate",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y, batch=self.text_batch)
-        Label("Use Enter to choose",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y - 20, batch=self.text_batch)
-
-    def _menu_action(self):
-        actions = list(reversed(list(self.menu_items.values())))
-        actions[self.cursor_pos]()
-
-    def _move_cursor(self, direction):
-        self.cursor_pos = (self.cursor_pos - direction) % len(self.menu_items)
-        self.cursor.y = self.camera.to_y_from_bottom(500 - 40 * self.cursor_pos)
-
     def _resume_game(self):
         self.world.reload(self.old_scene)
 
@@ -490,4 +519,5 @@ class InGameMenuScene(Scene):
     def _quit_game(self):
         #pylint: disable=import-outside-toplevel
         from python_tactics.scenes.preamble import MainMenuScene
+        self.old_scene.close()
         self.world.transition(MainMenuScene)
@@ -0,0 +1,74 @@
+from pyglet import clock
+from pyglet.graphics import Batch
+from pyglet.text import Label
+from pyglet.window import key
+from python_tactics.network import Lost, Setup, Started, Welcome
+from python_tactics.scenes import Scene
+from python_tactics.scenes.game import GameScene
+
+
+class LobbyScene(Scene):
+    """ Waits on the relay until the game is full and set up, then starts it.
+        Also where a network game ends up if the connection is lost, showing
+        why, with escape leading back to the main menu.
+    """
+
+    def __init__(self, world, connection, message=None):
+        super().__init__(world)
+        self.connection = connection
+        self.text_batch = Batch()
+        status_x, status_y = self.camera.to_xy_from_bottom_left(10, 300)
+        self.status = Label(message or "Connecting to %s..." % connection.host,
+                            font_name='Times New Roman', font_size=28,
+                            x=status_x, y=status_y, batch=self.text_batch)
+        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
+        Label("Use Escape to return to the menu",
+                font_name='Times New Roman', font_size=18,
+                x=hint_x, y=hint_y - 20, batch=self.text_batch)
+        if message:
+            connection.close()
+
+        self.key_handlers = {
+            (key.ESCAPE, 0) : self._main_menu
+        }
+
+    def enter(self):
+        clock.schedule(self._poll)
+
+    def exit(self):
+        clock.unschedule(self._poll)
+
+    def on_draw(self):
+        self.window.clear()
+        self.text_batch.draw()
+
+    def on_key_press(self, button, modifiers):
+        pressed = (button, modifiers)
+        handler = self.key_handlers.get(pressed, lambda: None)
+        handler()
+
+    def _poll(self, _delta):
+        # One message at a time, since the game wants whatever follows the setup
+        received = self.connection.poll()
+        while received is not None:
+            if isinstance(received, Welcome):
+                self.status.text = "Joined as player %d, waiting for the others" % (received.team + 1)
+            elif isinstance(received, Started) and self.connection.team == 0:
+                self.world.transition(GameScene, connection=self.connection, autosave=False)
+                return
+            elif isinstance(received, Started):
+                self.status.text = "Waiting for player 1 to set the game up"
+            elif isinstance(received, Setup):
+                state = received.game.terrain, received.game.packed
+                self.world.transition(GameScene, connection=self.connection, state=state, autosave=False)
+                return
+            elif isinstance(received, Lost):
+                self.status.text = received.reason
+                self.connection.close()
+            received = self.connection.poll()
+
+    def _main_menu(self):
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.scenes.preamble import MainMenuScene
+        self.connection.close()
+        self.world.transition(MainMenuScene)
@@ -1,37 +1,47 @@
+import os
+
 import pyglet
 from pyglet.graphics import Batch
 from pyglet.sprite import Sprite
 from pyglet.text import Label
 from pyglet.window import key
+from python_tactics.atlas import handle
+from python_tactics.paths import autosave_path
 from python_tactics.scenes import Scene
-from python_tactics.scenes.game import GameScene
-from python_tactics.util import load_sprite_asset
+from python_tactics.ui import Overlay
 
 
 class MainMenuScene(Scene):
 
-    def __init__(self, world):
+    def __init__(self, world, map_path=None):
+        """ New games are played on the terrain in the map file at map_path,
+            if given, or else on a generated map
+        """
         super().__init__(world)
-        self.text_batch = Batch()
-        self.cursor = Label(">", font_name='Times New Roman', font_size=36,
-                            x=self.camera.to_x_from_left(200),
-                            y=self.camera.to_y_from_bottom(300),
-                            batch=self.text_batch)
-        self.cursor_pos = 0
+        self.map_path = map_path
+        self.overlay = Overlay(self.camera)
         self.moogle = self._load_moogle()
 
-        self.menu_items = {
+        menu_items = {}
+        # Only offer to carry on when a game was left unfinished
+        if os.path.exists(autosave_path()):
+            menu_items["Continue"] = self._continue_game
+        menu_items.update({
             "Start Game"   : self._new_game,
+            "Versus Computer" : self._new_computer_game,
             "About"        : self._launch_about,
             "Quit Program" : self.window.close
-        }
-        self._generate_text()
+        })
+        self.menu = self.overlay.menu(menu_items, 240, 300, 40)
+        self.overlay.label('FF:Tactics.py', 10, 520, font_size=56)
+        self.overlay.label("Use Up and Down Arrows to navigate", 400, 30)
+        self.overlay.label("Use Enter to choose", 400, 10)
 
         self.key_handlers = {
             (key.ESCAPE, 0) : self.window.close,
-            (key.UP, 0)     : lambda: self._move_cursor(1),
-            (key.DOWN, 0)   : lambda: self._move_cursor(-1),
-            (key.ENTER, 0)  : self._menu_action
+            (key.UP, 0)     : lambda: self.menu.move(-1),
+            (key.DOWN, 0)   : lambda: self.menu.move(1),
+            (key.ENTER, 0)  : self.menu.choose
         }
 
     def enter(self):
@@ -41,7 +51,7 @@ class MainMenuScene(Scene):
     def on_draw(self):
         self.world.window.clear()
         self.moogle.draw()
-        self.text_batch.draw()
+        self.overlay.draw()
         self.camera.focus(self.window.width, self.window.height)
 
     def on_key_press(self, button, modifiers):
@@ -49,48 +59,40 @@ class MainMenuScene(Scene):
         handler = self.key_handlers.get(pressed, lambda: None)
         handler()
 
-    def _generate_text(self):
-        title_x, title_y = self.camera.to_xy_from_bottom_left(10, 520)
-        Label('FF:Tactics.py', font_name='Times New Roman', font_size=56,
-                x=title_x, y=title_y, batch=self.text_batch)
-
-        menu_texts = list(self.menu_items.keys())
-        for i, text in enumerate(menu_texts):
-            text_x, text_y = self.camera.to_xy_from_bottom_left(240, 300 - 40 * i)
-            Label(text, font_name='Times New Roman', font_size=36,
-                    x=text_x, y=text_y, batch=self.text_batch)
-
-        hint_x, hint_y = self.camera.to_xy_from_bottom_left(400, 30)
-        Label("Use Up and Down Arrows to navigate",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y, batch=self.text_batch)
-        Label("Use Enter to choose",
-                font_name='Times New Roman', font_size=18,
-                x=hint_x, y=hint_y - 20, batch=self.text_batch)
-
     def _load_moogle(self):
-        moogle_image = load_sprite_asset("moogle")
-        moogle_image.anchor_x = int(moogle_image.width / 2)
-        moogle_image.anchor_y = int(moogle_image.height / 2)
-        moog_sprite = Sprite(moogle_image,
+        moogle = handle("moogle")
+        self.use(moogle)
+        moog_sprite = Sprite(moogle.get(),
                         self.camera.to_x_from_left(40),
                         self.camera.to_y_from_bottom(40))
         return moog_sprite
 
+    def _start_game(self, **kwargs):
+        " Battle modules are imported in the background once the menu is up, or here if that has not finished "
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.scenes.game import GameScene
+        self.world.transition(GameScene, **kwargs)
+
     def _new_game(self):
-        self.world.transition(GameScene)
+        self._start_game(map_path=self.map_path)
+
+    def _continue_game(self):
+        " The save code needs numpy, so it is only imported once a save is asked for "
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.save import load
+        try:
+            saved = load(autosave_path())
+        except (OSError, ValueError) as error:
+            print("Could not continue: %s" % error)
+            return
+        self._start_game(computer_teams=saved.computer_teams, state=(saved.terrain, saved.packed))
+
+    def _new_computer_game(self):
+        self._start_game(map_path=self.map_path, computer_teams=(1,))
 
     def _launch_about(self):
         self.world.transition(AboutScene, previous=self)
 
-    def _menu_action(self):
-        actions = list(self.menu_items.values())
-        actions[self.cursor_pos]()
-
-    def _move_cursor(self, direction):
-        self.cursor_pos = (self.cursor_pos - direction) % len(self.menu_items)
-        self.cursor.y = self.camera.to_y_from_bottom(300 - 40 * self.cursor_pos)
-
 
 class AboutScene(Scene):
 
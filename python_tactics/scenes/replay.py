@@ -0,0 +1,67 @@
+from pyglet.window import key
+from python_tactics.replay import Replay
+from python_tactics.scenes.game import GameScene
+
+
+class ReplayScene(GameScene):
+    """ Plays a command log back at an adjustable speed.
+        Space pauses, up and down change speed, left and right skip a keyframe
+        either way and escape leaves.
+    """
+
+    REPLAY_MODE = 7
+
+    def __init__(self, world, path, turn=0, speed=1.0, replay=None):
+        self.path = path
+        self.replay = replay or Replay(path)
+        self.turn = max(0, min(turn, len(self.replay)))
+        self.speed = speed
+        self.paused = False
+        self.waited = 0
+        state = self.replay.grid, self.replay.battle_at(self.turn).pack()
+        super().__init__(world, state=state, record=False, autosave=False)
+        self.key_handlers[ReplayScene.REPLAY_MODE] = {
+            (key.ESCAPE, 0) : self._main_menu,
+            (key.SPACE, 0)  : self._pause,
+            (key.UP, 0)     : lambda: self._change_speed(2),
+            (key.DOWN, 0)   : lambda: self._change_speed(0.5),
+            (key.LEFT, 0)   : lambda: self._seek(-self.replay.keyframe_every),
+            (key.RIGHT, 0)  : lambda: self._seek(self.replay.keyframe_every),
+        }
+
+    @property
+    def viewing_team(self):
+        return self.current_turn
+
+    def start_turn(self):
+        self.display_turn_notice()
+        self.mode = ReplayScene.REPLAY_MODE
+
+    def _hidden(self, character):
+        return False
+
+    def _update_characters(self, delta):
+        super()._update_characters(delta)
+        if self.paused or self.turn >= len(self.replay):
+            return
+        self.waited += delta * self.speed
+        # Roughly a second a turn at normal speed, long enough for a unit to walk a few tiles
+        if self.waited >= 1:
+            self.waited = 0
+            action = self.replay.commands[self.turn]
+            self.turn += 1
+            self._play(self.battle.apply(action))
+
+    def _pause(self):
+        self.paused = not self.paused
+
+    def _change_speed(self, factor):
+        self.speed = min(64, max(0.25, self.speed * factor))
+
+    def _seek(self, turns):
+        self.world.transition(ReplayScene, self.path, turn=self.turn + turns, speed=self.speed, replay=self.replay)
+
+    def _main_menu(self):
+        #pylint: disable=import-outside-toplevel
+        from python_tactics.scenes.preamble import MainMenuScene
+        self.world.transition(MainMenuScene)
@@ -0,0 +1,204 @@
+"""
+    Headless AI-vs-AI battles in bulk, for balancing unit stats.
+
+    A sweep is the product of a grid of stat changes and a list of matchups.
+    Every point of the sweep is played the requested number of times, split
+    into batches that run across a process pool. Each worker folds its
+    matches into a Tally as it goes and only the tallies travel back, where
+    they are merged as they arrive, so memory use does not grow with the
+    number of matches.
+
+    Every match is seeded from the sweep seed, the point and the match
+    number, so results do not depend on how batches land on workers.
+"""
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from python_tactics.ai import POLICIES
+from python_tactics.battle import Attacked, Battle
+from python_tactics.units import NAMES, STATS, with_stats
+
+BATCH_SIZE = 200
+DEFAULT_MATCHUP = "beefy,ranged vs beefy,ranged"
+
+# stats maps kind name to {stat: value}, teams lists the kinds on each team
+SweepPoint = namedtuple("SweepPoint", "stats teams")
+
+
+class Tally:
+    " Running totals over many matches "
+
+    def __init__(self, team_count):
+        self.matches = 0
+        self.wins = [0] * team_count
+        self.draws = 0
+        self.turns = Counter()
+        self.damage = Counter()
+
+    def record(self, winner, turns):
+        self.matches += 1
+        self.turns[turns] += 1
+        if winner is None:
+            self.draws += 1
+        else:
+            self.wins[winner] += 1
+
+    def merge(self, other):
+        self.matches += other.matches
+        self.wins = [mine + theirs for mine, theirs in zip(self.wins, other.wins)]
+        self.draws += other.draws
+        self.turns.update(other.turns)
+        self.damage.update(other.damage)
+
+    def percentile(self, fraction):
+        " Turn count that fraction of matches finished within "
+        wanted = fraction * self.matches
+        seen = 0
+        for turns in sorted(self.turns):
+            seen += self.turns[turns]
+            if seen >= wanted:
+                return turns
+        return 0
+
+    def mean_turns(self):
+        return sum(turns * count for turns, count in self.turns.items()) / max(1, self.matches)
+
+    def report(self):
+        matches = max(1, self.matches)
+        wins = " ".join("%.1f%%" % (100 * won / matches) for won in self.wins)
+        hits = max(1, sum(self.damage.values()))
+        damage = " ".join("%d:%.0f%%" % (hit, 100 * count / hits) for hit, count in sorted(self.damage.items()))
+        return ("  matches %d  wins %s  draws %.1f%%\n"
+                "  turns mean %.1f median %d p90 %d\n"
+                "  damage %s") % (self.matches, wins, 100 * self.draws / matches, self.mean_turns(),
+                                  self.percentile(0.5), self.percentile(0.9), damage)
+
+
+def play(battle, policies, rng, max_turns, tally):
+    " Plays battle out, or until max_turns actions, recording it in tally "
+    turns = 0
+    while battle.winner is None and turns < max_turns:
+        for event in battle.apply(policies[battle.turn](battle, rng)):
+            if isinstance(event, Attacked):
+                tally.damage[event.damage] += 1
+        turns += 1
+    tally.record(battle.winner, turns)
+
+
+def run_batch(index, point, seed, first, count, policy_names, max_turns, size):
+    " Plays matches first to first + count of one sweep point. Runs in a worker. "
+    kinds = with_stats(point.stats)
+    policies = [POLICIES[name] for name in policy_names]
+    tally = Tally(len(point.teams))
+    for match in range(first, first + count):
+        rng = random.Random("%s:%d:%d" % (seed, index, match))
+        battle = Battle.skirmish(size, size, seed=rng.getrandbits(64), kinds=kinds, teams=point.teams)
+        play(battle, policies, rng, max_turns, tally)
+    return index, tally
+
+
+def sweep(points, matches, policy_names, seed=0, max_turns=300, size=10, workers=None, progress=None):
+    """ Plays every point matches times across a process pool, returning a
+        Tally per point. progress, if given, is called with the number of
+        matches finished so far as batches complete.
+    """
+    tallies = [Tally(len(point.teams)) for point in points]
+    done = 0
+    with ProcessPoolExecutor(workers) as pool:
+        batches = [pool.submit(run_batch, index, point, seed, first, min(BATCH_SIZE, matches - first),
+                               policy_names, max_turns, size)
+                   for index, point in enumerate(points) for first in range(0, matches, BATCH_SIZE)]
+        for finished in as_completed(batches):
+            index, tally = finished.result()
+            tallies[index].merge(tally)
+            done += tally.matches
+            if progress:
+                progress(done)
+    return tallies
+
+
+def parse_setting(setting):
+    " 'beefy.health=15,20' to ('beefy', 'health', [15, 20]) "
+    name, values = setting.split("=")
+    kind, stat = name.split(".")
+    if kind not in NAMES:
+        raise ValueError("Unknown unit kind %s" % kind)
+    if stat not in STATS:
+        raise ValueError("Unknown stat %s, expected one of %s" % (stat, ", ".join(STATS)))
+    parsed = []
+    for value in values.split(","):
+        if not value.strip().isdigit() or int(value) < STATS[stat]:
+            raise ValueError("%s.%s must be whole numbers of at least %d, not %s" % (kind, stat, STATS[stat], value))
+        parsed.append(int(value))
+    return kind, stat, parsed
+
+
+def parse_matchup(matchup):
+    " 'beefy,ranged vs ranged' to [[0, 1], [1]] "
+    return [[NAMES[name.strip()] for name in team.split(",")] for team in matchup.split(" vs ")]
+
+
+def sweep_points(settings, matchups):
+    " Every combination of the parsed settings with each parsed matchup "
+    axes = [[(kind, stat, value) for value in values] for kind, stat, values in settings]
+    points = []
+    for combination in itertools.product(*axes):
+        stats = {}
+        for kind, stat, value in combination:
+            stats.setdefault(kind, {})[stat] = value
+        points.extend(SweepPoint(stats, teams) for teams in matchups)
+    return points
+
+
+def describe(point):
+    kind_names = {kind: name for name, kind in NAMES.items()}
+    changes = " ".join("%s.%s=%s" % (kind, stat, value)
+                       for kind, stats in sorted(point.stats.items()) for stat, value in sorted(stats.items()))
+    teams = " vs ".join(",".join(kind_names[kind] for kind in team) for team in point.teams)
+    return "%s%s" % (changes + " | " if changes else "", teams)
+
+
+def add_parser(commands):
+    parser = commands.add_parser("simulate", help="run headless AI-vs-AI matches to compare unit stats")
+    parser.add_argument("-n", "--matches", type=int, default=1000, help="matches per sweep point")
+    parser.add_argument("-s", "--set", action="append", default=[], dest="settings", metavar="KIND.STAT=V1,V2",
+                        help="stat values to sweep over, eg beefy.health=15,20,25. May be repeated")
+    parser.add_argument("-m", "--matchup", action="append", dest="matchups", metavar="TEAM vs TEAM",
+                        help="kinds on each team, eg 'beefy,ranged vs ranged,ranged'. May be repeated")
+    parser.add_argument("-p", "--policy", nargs="+", default=["aggressive"], choices=sorted(POLICIES),
+                        help="policy for every team, or one per team")
+    parser.add_argument("--seed", default="0")
+    parser.add_argument("--size", type=int, default=10, help="width and depth of the map")
+    parser.add_argument("--max-turns", type=int, default=300, help="actions before a match is called a draw")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.set_defaults(run=main)
+
+
+def main(args):
+    try:
+        settings = [parse_setting(setting) for setting in args.settings]
+        matchups = [parse_matchup(matchup) for matchup in args.matchups or [DEFAULT_MATCHUP]]
+    except (KeyError, ValueError) as error:
+        sys.exit("simulate: bad setting or matchup: %s" % error)
+    points = sweep_points(settings, matchups)
+    team_count = max(len(teams) for teams in matchups)
+    policies = args.policy * team_count if len(args.policy) == 1 else args.policy
+    if len(policies) < team_count:
+        sys.exit("simulate: need a policy for each of %d teams" % team_count)
+    total = len(points) * args.matches
+
+    def progress(done):
+        print("\r%d/%d matches" % (done, total), end="", file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    tallies = sweep(points, args.matches, policies, args.seed, args.max_turns, args.size, args.workers, progress)
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+    for point, tally in zip(points, tallies):
+        print(describe(point))
+        print(tally.report())
+    print("%d matches in %.1fs (%.0f/s)" % (total, elapsed, total / elapsed))
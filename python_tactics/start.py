@@ -8,12 +8,18 @@ from pyglet.gl import (GL_BLEND, GL_ONE_MINUS_SRC_ALPHA, GL_SRC_ALPHA,
                        glBlendFunc, glEnable)
 from pyglet.window import Window
 
+from python_tactics import startup
 from python_tactics.camera import PEPPY, Camera
 from python_tactics.scenes import World
 from python_tactics.scenes.preamble import MainMenuScene
 
+# Not needed for the main menu, so imported in the background once it is up.
+# pyglet.media looks for audio libraries the first time it is touched.
+DEFERRED_IMPORTS = ("pyglet.media", "python_tactics.scenes.game")
 
-def start():
+
+def start(scene=MainMenuScene, **kwargs):
+    " Opens the window on scene, created with kwargs, and runs the game "
     glEnable(GL_BLEND)
     glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
@@ -25,7 +31,8 @@ def start():
 
     # Load the first scene
     world = World(window, camera)
-    world.transition(MainMenuScene)
+    with startup.span("first scene"):
+        world.transition(scene, **kwargs)
 
     # centre the window on whichever screen it is currently on
     window.set_location(int(window.screen.width/2 - window.width/2),
@@ -37,6 +44,18 @@ def start():
 
     # make the window visible at last
     window.set_visible(True)
+    startup.mark("window shown")
+
+    # Once the first frame is up, the rest can be imported while the player looks at the menu
+    def first_frame():
+        clock.schedule_once(interactive, 0)
+        window.remove_handlers(on_draw=first_frame)
+
+    def interactive(_delta):
+        startup.interactive()
+        startup.import_in_background(*DEFERRED_IMPORTS)
+
+    window.push_handlers(on_draw=first_frame)
 
     # finally, run the application
     pyglet.app.run()
@@ -0,0 +1,94 @@
+"""
+    A timeline of the game starting up, printed with --startup-report.
+
+    Times are from when this module was first imported, which the entry
+    point does before anything else. Spans record when something started
+    and how long it took. The game is interactive once the main menu's
+    first frame is on screen and it is back to waiting on input.
+
+    Everything is always recorded, since it is only a few entries. Once the
+    report has been printed, anything recorded later, like loads for the
+    first battle, is printed as it finishes.
+"""
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds the game should take to become interactive
+INTERACTIVE_TARGET = 1.0
+
+_START = time.perf_counter()
+# (seconds since the start, seconds taken or None for a mark, what happened)
+_events = []
+_reporting = False
+_interactive = None
+
+
+def elapsed():
+    return time.perf_counter() - _START
+
+
+def mark(label):
+    _record(elapsed(), None, label)
+
+
+@contextmanager
+def span(label):
+    started = elapsed()
+    try:
+        yield
+    finally:
+        _record(started, elapsed() - started, label)
+
+
+def import_in_background(*modules):
+    """ Imports modules, one after another, on a thread of their own. Anything
+        that imports one of them meanwhile waits for it to finish.
+    """
+    def run():
+        for module in modules:
+            with span("import %s" % module):
+                importlib.import_module(module)
+    thread = threading.Thread(target=run, name="imports", daemon=True)
+    thread.start()
+    return thread
+
+
+def interactive():
+    " Marks the game as interactive, the first time only, and prints the report if asked for "
+    global _interactive # pylint: disable=global-statement
+    if _interactive is None:
+        now = elapsed()
+        _record(now, None, "interactive")
+        _interactive = now
+        if _reporting:
+            report()
+
+
+def enable_report():
+    " Prints the report once the game is interactive, and anything after as it happens "
+    global _reporting # pylint: disable=global-statement
+    _reporting = True
+
+
+def report(output=sys.stdout):
+    print("startup: %8s %8s" % ("at ms", "took ms"), file=output)
+    for started, took, label in sorted(_events, key=lambda event: event[0]):
+        print(_line(started, took, label), file=output)
+    if _interactive is not None:
+        verdict = "within" if _interactive <= INTERACTIVE_TARGET else "over"
+        print("startup: interactive after %.3f s, %s the %.3f s target"
+              % (_interactive, verdict, INTERACTIVE_TARGET), file=output)
+    output.flush()
+
+
+def _line(started, took, label):
+    return "startup: %8.1f %8s %s" % (started * 1000, "" if took is None else "%.1f" % (took * 1000), label)
+
+
+def _record(started, took, label):
+    _events.append((started, took, label))
+    if _reporting and _interactive is not None:
+        print(_line(started, took, label), flush=True)
@@ -0,0 +1,113 @@
+"""
+    Retained-mode menus and panels.
+
+    Widgets are built once into an Overlay's Batch and only touched again
+    when what they show changes, like a cursor moving. Everything in an
+    Overlay is placed in window pixels from the bottom left. A group
+    translates the lot to wherever the camera is when it is drawn, so a
+    moving camera never means rebuilding anything.
+"""
+from pyglet.gl import (GL_BLEND, GL_COLOR_BUFFER_BIT, GL_ENABLE_BIT, GL_ONE_MINUS_SRC_ALPHA, GL_QUADS,
+                       GL_SRC_ALPHA, GL_TEXTURE_2D, glBlendFunc, glDisable, glEnable, glPopAttrib,
+                       glPopMatrix, glPushAttrib, glPushMatrix, glTranslatef)
+from pyglet.graphics import Batch, Group, OrderedGroup
+from pyglet.text import Label
+
+FONT = 'Times New Roman'
+
+
+class ScreenGroup(Group):
+    " Moves the origin to the bottom left of the window, as the camera currently sees it "
+
+    def __init__(self, camera, parent=None):
+        super().__init__(parent)
+        self.camera = camera
+
+    def set_state(self):
+        glPushMatrix()
+        glTranslatef(self.camera.to_x_from_left(0), self.camera.to_y_from_bottom(0), 0)
+
+    def unset_state(self):
+        glPopMatrix()
+
+
+class PanelGroup(OrderedGroup):
+    " Untextured, blended quads "
+
+    def set_state(self):
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT)
+        glDisable(GL_TEXTURE_2D)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        glPopAttrib()
+
+
+class Overlay:
+    " A Batch of widgets in window pixels, with panels behind text "
+
+    def __init__(self, camera):
+        self.batch = Batch()
+        screen = ScreenGroup(camera)
+        self.back = PanelGroup(0, screen)
+        self.front = OrderedGroup(1, screen)
+
+    def panel(self, x, y, width, height, color):
+        return Panel(x, y, width, height, color, self.batch, self.back)
+
+    def menu(self, items, x, y, spacing, **kwargs):
+        return Menu(items, x, y, spacing, self.batch, self.front, **kwargs)
+
+    def label(self, text, x, y, font_size=18, **kwargs):
+        return Label(text, font_name=FONT, font_size=font_size, x=x, y=y, batch=self.batch, group=self.front,
+                     **kwargs)
+
+    def draw(self):
+        self.batch.draw()
+
+
+class Panel:
+    " A rectangle of one color "
+
+    def __init__(self, x, y, width, height, color, batch, group):
+        self._vertex_list = batch.add(4, GL_QUADS, group, "v2f/static", ("c4B/static", tuple(color) * 4))
+        self.place(x, y, width, height)
+
+    def place(self, x, y, width, height):
+        self._vertex_list.vertices[:] = (x, y, x + width, y, x + width, y + height, x, y + height)
+
+    def delete(self):
+        self._vertex_list.delete()
+
+
+class Menu:
+    """ A column of choices, top first, spacing pixels apart with the top one
+        at y, and a cursor indent pixels to their left. items maps the text
+        of each choice to what choosing it does.
+    """
+
+    def __init__(self, items, x, y, spacing, batch, group, font_size=36, indent=40):
+        self.items = dict(items)
+        self.x, self.y, self.spacing = x, y, spacing
+        self.selected = 0
+        self.labels = [Label(text, font_name=FONT, font_size=font_size, x=x, y=y - spacing * row,
+                             batch=batch, group=group)
+                       for row, text in enumerate(self.items)]
+        self.cursor = Label(">", font_name=FONT, font_size=font_size, x=x - indent, y=y, batch=batch, group=group)
+
+    def move(self, rows):
+        " Moves the cursor down rows, or up if negative, wrapping around "
+        self.select((self.selected + rows) % len(self.items))
+
+    def select(self, row):
+        self.selected = row
+        self.cursor.y = self.y - self.spacing * row
+
+    def choose(self):
+        list(self.items.values())[self.selected]()
+
+    def delete(self):
+        for label in self.labels:
+            label.delete()
+        self.cursor.delete()
@@ -0,0 +1,49 @@
+"""
+    Stats for every kind of unit. Kept apart from characters.py, which needs
+    pyglet and loads sprites on import, so headless code can share them.
+"""
+
+
+class Beefy:
+
+    kind     = 0
+    health   = 20
+    speed    = 3
+    range    = 1
+    strength = 10
+    defense  = 10
+    magic    = 0
+    sight    = 5
+
+
+class Ranged:
+
+    kind     = 1
+    health   = 10
+    speed    = 2
+    range    = 4
+    strength = 5
+    defense  = 5
+    magic    = 5
+    sight    = 6
+
+
+# Indexed by kind
+KINDS = (Beefy, Ranged)
+NAMES = {stats.__name__.lower(): stats.kind for stats in KINDS}
+# Stats that can be changed, and the least each can be; kind is what a unit is, not a stat.
+# Damage rolls below strength and defense, so neither may be 0
+STATS = {"health": 1, "speed": 1, "range": 1, "strength": 1, "defense": 1, "magic": 0, "sight": 1}
+
+
+def with_stats(overrides, kinds=KINDS):
+    """ A copy of kinds with some stats changed. overrides maps a kind's
+        lowercase name to the stats to change, eg {"beefy": {"health": 25}}
+    """
+    for stats in overrides.values():
+        for stat, value in stats.items():
+            if stat not in STATS:
+                raise ValueError("Unknown stat %s" % stat)
+            if not isinstance(value, int) or value < STATS[stat]:
+                raise ValueError("%s must be a whole number of at least %d, not %r" % (stat, STATS[stat], value))
+    return tuple(type(stats.__name__, (stats,), overrides.get(stats.__name__.lower(), {})) for stats in kinds)
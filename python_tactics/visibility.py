@@ -0,0 +1,154 @@
+"""
+    Line of sight and fog of war over a TileGrid.
+
+    Fields of view are found with symmetric shadowcasting
+    (https://www.albertford.com/shadowcasting/), run in each of the four
+    quadrants around a viewer. A tile blocks sight when it is flagged OPAQUE
+    or rises above the viewer's eye line, which sits EYE_HEIGHT above the
+    tile the viewer stands on. Slopes are kept as integer fractions so the
+    whole scan is exact and stays in plain integer arithmetic.
+
+    Vision keeps a per-team count of how many units can see each tile, so
+    when one unit moves only that unit's field is recomputed. Fields only
+    depend on the terrain, so they are remembered per origin and sight until
+    the terrain changes, up to KNOWN_FIELDS of them, least recently used
+    going first. They are never pickled, since they are quick to find again.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from python_tactics.grid import OPAQUE
+
+EYE_HEIGHT = 1
+# Fields of view remembered at once
+KNOWN_FIELDS = 256
+
+# Maps (depth, column) within a quadrant onto (di, dj) around the viewer
+QUADRANTS = ((-1, 0, 0, 1), (1, 0, 0, 1), (0, 1, 1, 0), (0, 1, -1, 0))
+
+
+def field_of_view(grid, origin, radius):
+    """ Flat indices (i * depth + j) of every tile visible from origin within a
+        manhattan distance of radius, including origin itself.
+    """
+    origin_i, origin_j = origin
+    width, depth = grid.shape
+    lo_i, lo_j = max(0, origin_i - radius), max(0, origin_j - radius)
+    hi_i, hi_j = min(width, origin_i + radius + 1), min(depth, origin_j + radius + 1)
+    # Work from plain lists over just the window the viewer could possibly see
+    eye_line = int(grid.height[origin_i, origin_j]) + EYE_HEIGHT
+    blocking = ((grid.height[lo_i:hi_i, lo_j:hi_j] > eye_line)
+                | (grid.flags[lo_i:hi_i, lo_j:hi_j] & OPAQUE != 0)).tolist()
+
+    seen = {origin_i * depth + origin_j}
+    for depth_i, column_i, depth_j, column_j in QUADRANTS:
+        # Each row is (depth, start slope numerator, denominator, end slope numerator, denominator)
+        rows = [(1, -1, 1, 1, 1)]
+        while rows:
+            row, start_n, start_d, end_n, end_d = rows.pop()
+            if row > radius:
+                continue
+            # Round depth * start slope half up, and depth * end slope half down
+            first = (2 * row * start_n + start_d) // (2 * start_d)
+            last = -((end_d - 2 * row * end_n) // (2 * end_d))
+            previous = None
+            row_i, row_j = origin_i + depth_i * row, origin_j + depth_j * row
+            for column in range(first, last + 1):
+                i, j = row_i + column_i * column, row_j + column_j * column
+                # Off the map (or beyond the radius) counts as open ground that is never revealed
+                if not (lo_i <= i < hi_i and lo_j <= j < hi_j):
+                    wall = False
+                else:
+                    wall = blocking[i - lo_i][j - lo_j]
+                    symmetric = column * start_d >= row * start_n and column * end_d <= row * end_n
+                    if (wall or symmetric) and row + abs(column) <= radius:
+                        seen.add(i * depth + j)
+                if previous is True and wall is False:
+                    start_n, start_d = 2 * column - 1, 2 * row
+                if previous is False and wall is True:
+                    rows.append((row + 1, start_n, start_d, 2 * column - 1, 2 * row))
+                previous = wall
+            if previous is False:
+                rows.append((row + 1, start_n, start_d, end_n, end_d))
+    return seen
+
+
+class Vision:
+    " Tracks what every unit, and so every team, can currently see "
+
+    def __init__(self, grid, team_count):
+        self.grid = grid
+        self.counts = np.zeros((team_count,) + grid.shape, dtype=np.uint16)
+        self._fields = {}
+        self._known = OrderedDict()
+
+    def copy(self):
+        " An independent copy, still sharing the remembered fields of view "
+        other = Vision.__new__(Vision)
+        other.grid = self.grid
+        other.counts = self.counts.copy()
+        other._fields = dict(self._fields)
+        other._known = self._known
+        return other
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_known"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._known = OrderedDict()
+
+    def place(self, unit_id, team, origin, radius):
+        " Records a unit spawning at or moving to origin with a sight of radius "
+        self.remove(unit_id)
+        field = self._field(origin, radius)
+        self._fields[unit_id] = (team, origin, radius, field)
+        self.counts[team].flat[field[1]] += 1
+
+    def remove(self, unit_id):
+        " Forgets a unit, such as when it dies "
+        if unit_id in self._fields:
+            team, _, _, field = self._fields.pop(unit_id)
+            self.counts[team].flat[field[1]] -= 1
+
+    def refresh(self):
+        " Recomputes every field, for when the terrain itself changes "
+        self._known.clear()
+        for unit_id, (team, origin, radius, _) in list(self._fields.items()):
+            self.place(unit_id, team, origin, radius)
+
+    def visible(self, team):
+        " Boolean mask of the tiles the team can see "
+        return self.counts[team] > 0
+
+    def team_sees(self, team, i, j):
+        return self.grid.in_bounds(i, j) and self.counts[team, i, j] > 0
+
+    def unit_sees(self, unit_id, i, j):
+        " Whether a unit has its own line of sight to (i, j) "
+        field = self._fields.get(unit_id)
+        return field is not None and i * self.grid.depth + j in field[3][0]
+
+    def unit_field(self, unit_id):
+        " Boolean mask of the tiles a single unit can see "
+        mask = np.zeros(self.grid.shape, dtype=bool)
+        field = self._fields.get(unit_id)
+        if field is not None:
+            mask.flat[field[3][1]] = True
+        return mask
+
+    def _field(self, origin, radius):
+        # The set for membership tests, and an index array for updating counts
+        key = origin, radius
+        field = self._known.get(key)
+        if field is None:
+            seen = field_of_view(self.grid, origin, radius)
+            field = self._known[key] = seen, np.fromiter(seen, dtype=np.intp, count=len(seen))
+            if len(self._known) > KNOWN_FIELDS:
+                self._known.popitem(last=False)
+        else:
+            self._known.move_to_end(key)
+        return field
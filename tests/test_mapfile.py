@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from python_tactics.__main__ import command_modules
+from python_tactics.grid import OPAQUE, TileGrid
+from python_tactics.mapfile import MapFile, write_map
+
+
+class MapFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "saved.ptmp")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_loads_a_saved_map(self):
+        # Not a multiple of the chunk size either way, so the edge chunks are partial
+        saved = TileGrid(21, 35, 0, 0, 1, 1)
+        rng = np.random.default_rng(1)
+        saved.block[:] = rng.integers(0, 101, saved.shape)
+        saved.height[:] = rng.integers(0, 5, saved.shape)
+        saved.flags[3, 4] |= OPAQUE
+        saved.cost[:] = rng.integers(1, 4, saved.shape)
+        write_map(self.path, saved, chunk_size=8)
+
+        source = MapFile(self.path)
+        loaded = TileGrid(source.width, source.depth, 0, 0, 1, 1)
+        for chunk_i in range(source.chunks_wide):
+            for chunk_j in range(source.chunks_deep):
+                source.read_into(loaded, chunk_i, chunk_j)
+        source.close()
+
+        self.assertEqual(loaded.shape, saved.shape)
+        for field in ("block", "height", "flags", "cost"):
+            np.testing.assert_array_equal(getattr(loaded, field), getattr(saved, field))
+
+    def test_refuses_other_files(self):
+        with open(self.path, "wb") as other:
+            other.write(b"not a map at all")
+        with self.assertRaises(ValueError):
+            MapFile(self.path)
+
+    def test_map_option_is_not_a_command(self):
+        self.assertEqual(command_modules(["--map", self.path]), [])
+        self.assertEqual(command_modules(["--map", self.path, "simulate"]), ["simulate"])
+
+
+if __name__ == "__main__":
+    unittest.main()